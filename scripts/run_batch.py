@@ -0,0 +1,34 @@
+from __future__ import annotations
+import argparse
+import pathlib
+from microstructure.batch import read_manifest, run_batch
+
+def main():
+    root = pathlib.Path(__file__).resolve().parents[1]
+    ap = argparse.ArgumentParser(description="run many equity days from a manifest in a process pool")
+    ap.add_argument("manifest", help="csv or json with symbol, session_date, csv_path, price_in_nanos")
+    ap.add_argument("--out", default=str(root / "figures" / "equities"))
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--max-big", type=int, default=2, help="concurrent jobs with inputs above --big-gb")
+    ap.add_argument("--big-gb", type=float, default=2.0)
+    ap.add_argument("--retries", type=int, default=1)
+    ap.add_argument("--figures", choices=["full", "fast", "none"], default="fast", help="none writes metrics only")
+    ap.add_argument("--cache-dir", default=str(root / "data" / "cache"))
+    ap.add_argument("--store", default=str(root / "data" / "metrics"), help="metrics store root, empty to skip")
+    args = ap.parse_args()
+
+    status = run_batch(
+        read_manifest(args.manifest),
+        out_root=args.out,
+        workers=args.workers,
+        max_big_jobs=args.max_big,
+        big_bytes=int(args.big_gb * (1 << 30)),
+        retries=args.retries,
+        cache_dir=args.cache_dir or None,
+        figures=args.figures,
+        metrics_store=args.store or None,
+    )
+    print(status["status"].value_counts().to_string())
+
+if __name__ == "__main__":
+    main()
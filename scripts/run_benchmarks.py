@@ -0,0 +1,34 @@
+from __future__ import annotations
+import argparse
+import json
+import pathlib
+import sys
+from microstructure.benchmark import compare_baseline, load_report, run_benchmarks, summarize
+
+def main():
+    root = pathlib.Path(__file__).resolve().parents[1]
+    ap = argparse.ArgumentParser(description="time the book, depth, impact and fx hot paths on synthetic data")
+    ap.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    ap.add_argument("--base-events", type=int, default=20_000, help="MBO rows at scale 1")
+    ap.add_argument("--base-fx", type=int, default=5_000, help="EBS book records at scale 1")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    ap.add_argument("--out", default=str(root / "benchmarks" / "latest.json"))
+    ap.add_argument("--compare", default=None, help="baseline json to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    args = ap.parse_args()
+
+    prof = run_benchmarks(args.scales, args.base_events, args.base_fx, seed=args.seed,
+                          repeat=args.repeat, memory=not args.no_memory)
+    path = prof.write(args.out)
+    report = json.loads(path.read_text())
+    print(summarize(report).to_string())
+    if args.compare:
+        cmp = compare_baseline(report, load_report(args.compare), args.tolerance)
+        print(cmp.to_string())
+        if cmp["regression"].any():
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
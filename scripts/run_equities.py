@@ -7,6 +7,8 @@ def main():
     data_root = root / "data"
     figs_root = root / "figures" / "equities"
     figs_root.mkdir(parents=True, exist_ok=True)
+    cache_dir = str(data_root / "cache")
+    metrics_store = str(data_root / "metrics")
 
     run_equity_day(
         csv_path=str(data_root / "msft" / "mbo.csv"),
@@ -14,6 +16,8 @@ def main():
         session_date="2025-07-22",
         out_dir=str(figs_root / "msft"),
         price_in_nanos=True,
+        cache_dir=cache_dir,
+        metrics_store=metrics_store,
     )
 
     run_equity_day(
@@ -22,6 +26,8 @@ def main():
         session_date="2025-07-30",
         out_dir=str(figs_root / "qubt"),
         price_in_nanos=False,
+        cache_dir=cache_dir,
+        metrics_store=metrics_store,
     )
 
 if __name__ == "__main__":
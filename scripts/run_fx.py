@@ -1,6 +1,7 @@
 from __future__ import annotations
 import pathlib
 from microstructure.fx_pipeline import build_fx_panels, fx_summary_and_figures
+from microstructure.profiling import RunProfile
 
 def main():
     root = pathlib.Path(__file__).resolve().parents[1]
@@ -8,13 +9,19 @@ def main():
     out_dir = root / "figures" / "fx"
 
     pairs = ["EUR/USD", "EUR/JPY", "USD/JPY"]
+    profile = RunProfile("fx", pairs=pairs)
 
     panels = build_fx_panels(
         order_csv=str(data_root / "orders.csv"),
         trade_csv=str(data_root / "trades.csv"),
         pairs=pairs,
+        profile=profile,
     )
-    fx_summary_and_figures(panels, str(out_dir), pairs)
+    # EBS times are session clock times, so the first record's date is the trading day
+    session_date = panels["tob"]["timestamp"].min().date().isoformat()
+    fx_summary_and_figures(panels, str(out_dir), pairs, profile=profile,
+                           metrics_store=str(root / "data" / "metrics"), session_date=session_date,
+                           tz="America/New_York")
 
 if __name__ == "__main__":
     main()
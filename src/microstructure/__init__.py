@@ -5,10 +5,31 @@ from .metrics import (
     ohlc_per_minute,
     vwap_per_minute,
     build_l2_by_bucket,
+    build_l2_snapshots,
     depth_near_touch,
+    depth_profile,
     price_impact_by_minute,
+    price_impact_curve,
+    price_impact_event_time,
+    grouped_ols,
     build_mid_and_px_series,
     log_returns,
     realized_variance,
     acf_np,
+    acf_fft,
+    ccf_fft,
+    lagged_sums,
 )
+from .bars import build_bars, bar_ids, dense_time_bars
+from .book import OrderBook, PriceLadder, L2Snapshots, TopOfBookTape, replay_book
+from .loaders import load_session, read_mbo_session
+from .cache import SessionCache
+from .book_index import BookIndex
+from .fx_book import replay_fx_book, fx_top_of_book_grid
+from .arbitrage import scan_cycles, currency_cycles
+from .stream import StreamingSession, RunningACF
+from .realized import log_price_panel, realized_measures, rv_signature, two_scale_rv, realized_kernel, bipower_variation
+from .profiling import RunProfile
+from .synthetic import synthetic_mbo, synthetic_ebs
+from .dag import StageGraph, StageStore, content_hash
+from .store import MetricsStore, METRIC_SCHEMAS, with_minute
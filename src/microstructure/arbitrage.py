@@ -0,0 +1,142 @@
+from __future__ import annotations
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .fx_book import with_mid
+
+Cycle = Tuple[str, ...]
+
+SUMMARY_COLUMNS = [
+    "cycle", "legs", "n_valid", "n_flagged", "freq_pct", "n_runs", "avg_duration_sec", "max_duration_sec",
+    "abs_gap_median", "capacity_median", "capacity_median_flagged",
+]
+
+def split_pair(pair: str) -> Tuple[str, str]:
+    base, quote = pair.replace("-", "/").split("/")
+    return base, quote
+
+def currency_cycles(pairs: Iterable[str], max_len: int = 3) -> List[Cycle]:
+    """Every simple currency cycle of length 3..max_len that the quoted pairs close, each listed once."""
+    adj: Dict[str, set] = {}
+    for p in pairs:
+        b, q = split_pair(p)
+        adj.setdefault(b, set()).add(q)
+        adj.setdefault(q, set()).add(b)
+
+    out: List[Cycle] = []
+    def walk(path: List[str]) -> None:
+        head, last = path[0], path[-1]
+        if len(path) >= 3 and head in adj[last] and path[1] < path[-1]:
+            out.append(tuple(path))
+        if len(path) == max_len:
+            return
+        for nxt in sorted(adj[last]):
+            if nxt > head and nxt not in path:
+                walk(path + [nxt])
+
+    for c in sorted(adj):
+        walk([c])
+    return out
+
+def cycle_matrix(cycles: Sequence[Cycle], pairs: Sequence[str]) -> np.ndarray:
+    """(cycles, pairs) matrix of +1/-1 orientations so gap = sum of signed log rates."""
+    idx = {split_pair(p): j for j, p in enumerate(pairs)}
+    S = np.zeros((len(cycles), len(pairs)))
+    for i, cyc in enumerate(cycles):
+        for x, y in zip(cyc, cyc[1:] + cyc[:1]):
+            if (x, y) in idx:
+                S[i, idx[(x, y)]] += 1.0
+            else:
+                S[i, idx[(y, x)]] -= 1.0
+    return S
+
+def cycle_name(cyc: Cycle) -> str:
+    return ">".join(cyc + cyc[:1])
+
+def top_of_book_on_grid(tob: pd.DataFrame, pairs: Sequence[str], freq: str = "1s") -> Tuple[pd.DatetimeIndex, Dict[str, np.ndarray]]:
+    """As-of mid and best sizes for every pair on one shared integer time grid, NaN while a book is one sided or crossed."""
+    t = with_mid(tob)
+    ts = t["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    step = pd.Timedelta(freq).value
+    if ts.size == 0:
+        return pd.DatetimeIndex([], dtype="datetime64[ns]"), {f: np.empty((0, len(pairs))) for f in ("mid", "bid_size", "ask_size")}
+    lo = ts.min() - ts.min() % step
+    grid = np.arange(lo, ts.max() + 1, step, dtype=np.int64)
+
+    fields = {"mid": [], "bid_size": [], "ask_size": []}
+    codes = t["pair"].astype(str).to_numpy()
+    for p in pairs:
+        sel = np.flatnonzero(codes == p)
+        i = np.searchsorted(ts[sel], grid, side="right") - 1
+        for f in fields:
+            v = t[f].to_numpy(dtype=float)[sel]
+            fields[f].append(np.where(i >= 0, v[np.maximum(i, 0)] if sel.size else np.nan, np.nan))
+    index = pd.DatetimeIndex(grid.astype("datetime64[ns]"))
+    return index, {f: np.column_stack(v) if v else np.empty((grid.size, 0)) for f, v in fields.items()}
+
+def run_lengths(flags: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Column id and length of every run of True in a (time, columns) bool matrix."""
+    f = np.zeros((flags.shape[1], flags.shape[0] + 2), dtype=np.int8)
+    f[:, 1:-1] = flags.T
+    d = np.diff(f, axis=1)
+    col, start = np.nonzero(d == 1)
+    _, end = np.nonzero(d == -1)
+    return col, end - start
+
+def scan_cycles(
+    tob: pd.DataFrame,
+    pairs: Sequence[str],
+    freq: str = "1s",
+    tau: float = 1e-4,
+    max_len: int = 3,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Flag cycles whose log mid gap exceeds tau on a regular grid; returns the per cycle summary and the gap matrix."""
+    pairs = list(pairs)
+    cycles = currency_cycles(pairs, max_len=max_len)
+    S = cycle_matrix(cycles, pairs)
+    index, book = top_of_book_on_grid(tob, pairs, freq)
+    names = [cycle_name(c) for c in cycles]
+    if index.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS), pd.DataFrame(index=index, columns=names, dtype=float)
+
+    logm = np.log(book["mid"])
+    gaps = np.nan_to_num(logm) @ S.T
+    valid = ~(np.isnan(logm).astype(float) @ np.abs(S.T)).astype(bool)
+    gaps[~valid] = np.nan
+    flags = valid & (np.abs(gaps) > tau)
+
+    # leg with +1 is rich when the gap is positive, so it is sold at the bid
+    n_t, n_c = gaps.shape
+    cap = np.full((n_t, n_c), np.nan)
+    for k in range(n_c):
+        legs = np.flatnonzero(S[k])
+        sell = (S[k, legs][None, :] * np.sign(gaps[:, [k]])) > 0
+        depth = np.where(sell, book["bid_size"][:, legs], book["ask_size"][:, legs])
+        cap[:, k] = depth.min(axis=1)
+
+    step_sec = pd.Timedelta(freq).total_seconds()
+    col, length = run_lengths(flags)
+    n_runs = np.bincount(col, minlength=n_c)
+    run_sum = np.bincount(col, weights=length, minlength=n_c)
+    run_max = np.zeros(n_c)
+    np.maximum.at(run_max, col, length)
+    n_valid = valid.sum(axis=0)
+    n_flag = flags.sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        summary = pd.DataFrame({
+            "cycle": names,
+            "legs": [" ".join(np.asarray(pairs)[S[k] != 0]) for k in range(n_c)],
+            "n_valid": n_valid,
+            "n_flagged": n_flag,
+            "freq_pct": np.where(n_valid > 0, 100.0 * n_flag / n_valid, np.nan),
+            "n_runs": n_runs,
+            "avg_duration_sec": np.where(n_runs > 0, run_sum / np.maximum(n_runs, 1) * step_sec, 0.0),
+            "max_duration_sec": run_max * step_sec,
+            "abs_gap_median": [np.nanmedian(np.abs(gaps[:, k])) if n_valid[k] else np.nan for k in range(n_c)],
+            "capacity_median": [np.nanmedian(cap[valid[:, k], k]) if n_valid[k] else np.nan for k in range(n_c)],
+            "capacity_median_flagged": [np.nanmedian(cap[flags[:, k], k]) if n_flag[k] else np.nan for k in range(n_c)],
+        }, columns=SUMMARY_COLUMNS)
+    return summary, pd.DataFrame(gaps, index=index, columns=names)
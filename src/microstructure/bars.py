@@ -0,0 +1,120 @@
+from __future__ import annotations
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from .book import BUCKET_ALIASES
+
+ACTIONS = ("A", "C", "R", "F", "T")
+COUNT_COLUMNS = ["n_trades", "n_orders_new", "n_orders_add", "n_orders_cancel", "n_orders_replace"]
+OHLC_COLUMNS = ["open", "high", "low", "close"]
+
+# ---------- bar ids
+
+def bar_ids(mbo: pd.DataFrame, kind: str = "time", width: Union[str, float] = "1min") -> np.ndarray:
+    """Non decreasing integer bar key per event of a time sorted session frame."""
+    if kind == "time":
+        t = mbo["ts_et"] if "ts_et" in mbo.columns else mbo["ts"]
+        if t.dt.tz is not None:
+            t = t.dt.tz_localize(None)
+        ns = t.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        step = pd.Timedelta(BUCKET_ALIASES.get(width, width)).value
+        return ns - ns % step
+    if kind not in ("volume", "dollar"):
+        raise ValueError(f"unknown bar kind {kind!r}")
+    x = np.where((mbo["action"] == "T").to_numpy(), mbo["size"].to_numpy(dtype=float), 0.0)
+    if kind == "dollar":
+        x = x * mbo["px"].to_numpy(dtype=float)
+    before = np.cumsum(x) - x
+    return np.floor(before / float(width)).astype(np.int64)
+
+# ---------- single pass bar builder
+
+def build_bars(mbo: pd.DataFrame, kind: str = "time", width: Union[str, float] = "1min") -> pd.DataFrame:
+    """One row of bar statistics for every bar that holds an event, from one pass over contiguous bar ids."""
+    key = bar_ids(mbo, kind, width)
+    order = None
+    if key.size > 1 and (key[1:] < key[:-1]).any():
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+    take = (lambda a: a[order]) if order is not None else (lambda a: a)
+
+    n = key.size
+    new = np.empty(n, dtype=bool)
+    new[:1] = True
+    np.not_equal(key[1:], key[:-1], out=new[1:])
+    starts = np.flatnonzero(new)
+    bar = np.cumsum(new) - 1
+    nb = starts.size
+    ends = np.r_[starts[1:], n] - 1
+
+    # all action counts in one bincount over (bar, action) cells
+    k = len(ACTIONS)
+    code = take(pd.Categorical(mbo["action"], categories=ACTIONS).codes.astype(np.int64))
+    code[code < 0] = k
+    counts = np.bincount(bar * (k + 1) + code, minlength=nb * (k + 1)).reshape(nb, k + 1)
+    c = {a: counts[:, i] for i, a in enumerate(ACTIONS)}
+
+    # trade sums in one reduceat over the trade rows, which keep bar order
+    tr = np.flatnonzero(code == ACTIONS.index("T"))
+    px = take(mbo["px"].to_numpy(dtype=float))[tr]
+    size = take(mbo["size"].to_numpy(dtype=float))[tr]
+    side = take(mbo["side"].to_numpy())[tr]
+    sgn = np.where(side == "B", 1.0, np.where(side == "A", -1.0, 0.0))
+    cols = np.column_stack([size, px * size, sgn * size, sgn > 0, sgn < 0, (sgn > 0) * size, (sgn < 0) * size])
+
+    sums = np.zeros((nb, cols.shape[1]))
+    o = np.full((nb, 4), np.nan)
+    if tr.size:
+        tbar = bar[tr]
+        tstarts = np.flatnonzero(np.r_[True, tbar[1:] != tbar[:-1]])
+        tb = tbar[tstarts]
+        sums[tb] = np.add.reduceat(cols, tstarts, axis=0)
+        o[tb, 0] = px[tstarts]
+        o[tb, 1] = np.maximum.reduceat(px, tstarts)
+        o[tb, 2] = np.minimum.reduceat(px, tstarts)
+        o[tb, 3] = px[np.r_[tstarts[1:], tr.size] - 1]
+
+    ts = take(mbo["ts_et"] if "ts_et" in mbo.columns else mbo["ts"])
+    ts = ts.reset_index(drop=True) if isinstance(ts, pd.Series) else pd.Series(ts)
+    if kind == "time":
+        index = pd.DatetimeIndex(key[starts].astype("datetime64[ns]"))
+        if ts.dt.tz is not None:
+            index = index.tz_localize(ts.dt.tz)
+    else:
+        index = pd.Index(key[starts])
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = pd.DataFrame({
+            "ts_open": ts.iloc[starts].to_numpy(),
+            "ts_close": ts.iloc[ends].to_numpy(),
+            "n_events": np.diff(np.r_[starts, n]),
+            "n_trades": c["T"],
+            "n_orders_new": c["A"] + c["F"] + c["R"],
+            "n_orders_add": c["A"],
+            "n_orders_cancel": c["C"],
+            "n_orders_replace": c["R"],
+            "n_orders_fill": c["F"],
+            "volume": sums[:, 0],
+            "dollar_volume": sums[:, 1],
+            "open": o[:, 0],
+            "high": o[:, 1],
+            "low": o[:, 2],
+            "close": o[:, 3],
+            "vwap": sums[:, 1] / sums[:, 0],
+            "n_buy": sums[:, 3].astype(np.int64),
+            "n_sell": sums[:, 4].astype(np.int64),
+            "buy_volume": sums[:, 5],
+            "sell_volume": sums[:, 6],
+            "signed_volume": sums[:, 2],
+        }, index=index)
+    out.index.name = "bar"
+    return out
+
+def dense_time_bars(bars: pd.DataFrame, width: str = "1min") -> pd.DataFrame:
+    """Time bars reindexed onto every bucket between the first and the last."""
+    if bars.empty:
+        return bars
+    full = pd.date_range(bars.index[0], bars.index[-1], freq=BUCKET_ALIASES.get(width, width), name=bars.index.name)
+    return bars.reindex(full)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+import os
+import pathlib
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from .equities_pipeline import run_equity_day
+
+MANIFEST_COLUMNS = ["symbol", "session_date", "csv_path", "price_in_nanos"]
+STATUS_KEY = ["symbol", "session_date"]
+STATUS_COLUMNS = STATUS_KEY + ["csv_path", "out_dir", "input_bytes", "attempts", "status", "error", "seconds"]
+
+def read_manifest(path: str) -> List[Dict[str, object]]:
+    """Jobs from a csv or json manifest with symbol, session_date, csv_path and price_in_nanos."""
+    p = pathlib.Path(path)
+    df = pd.read_json(p) if p.suffix == ".json" else pd.read_csv(p, dtype={"session_date": str})
+    missing = [c for c in MANIFEST_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"manifest {path} is missing columns {missing}")
+    df["price_in_nanos"] = df["price_in_nanos"].astype(str).str.lower().isin(["true", "1", "yes"])
+    return df.to_dict("records")
+
+def _run_job(job: Dict[str, object]) -> Dict[str, object]:
+    t0 = time.perf_counter()
+    try:
+        run_equity_day(
+            csv_path=str(job["csv_path"]),
+            symbol=str(job["symbol"]),
+            session_date=str(job["session_date"]),
+            out_dir=str(job["out_dir"]),
+            price_in_nanos=bool(job["price_in_nanos"]),
+            cache_dir=job.get("cache_dir"),
+            figures=str(job.get("figures") or "full"),
+            metrics_store=job.get("metrics_store"),
+        )
+        return {"status": "ok", "error": "", "seconds": time.perf_counter() - t0}
+    except Exception as e:
+        tb = traceback.format_exc(limit=3).strip().splitlines()
+        return {"status": "failed", "error": f"{type(e).__name__}: {e} | {tb[-1] if tb else ''}", "seconds": time.perf_counter() - t0}
+
+def _input_bytes(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def run_batch(
+    jobs: List[Dict[str, object]],
+    out_root: str,
+    workers: Optional[int] = None,
+    max_big_jobs: int = 2,
+    big_bytes: int = 2 << 30,
+    retries: int = 1,
+    cache_dir: Optional[str] = None,
+    figures: str = "full",
+    metrics_store: Optional[str] = None,
+) -> pd.DataFrame:
+    """Run many (symbol, session_date) equity days in a process pool, retrying failed jobs."""
+    out = pathlib.Path(out_root)
+    out.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    pending = []
+    for job in jobs:
+        j = dict(job)
+        j.setdefault("out_dir", str(out / str(j["symbol"]).lower() / str(j["session_date"])))
+        j["cache_dir"] = j.get("cache_dir") or cache_dir
+        j["figures"] = j.get("figures") or figures
+        j["metrics_store"] = metrics_store
+        j["input_bytes"] = _input_bytes(str(j["csv_path"]))
+        j["attempts"] = 0
+        pending.append(j)
+    pending.sort(key=lambda j: j["input_bytes"], reverse=True)
+
+    running: Dict[Future, Dict[str, object]] = {}
+    done: List[Dict[str, object]] = []
+
+    def next_job() -> Optional[Dict[str, object]]:
+        n_big = sum(1 for j in running.values() if j["input_bytes"] >= big_bytes)
+        for i, j in enumerate(pending):
+            if j["input_bytes"] < big_bytes or n_big < max_big_jobs:
+                return pending.pop(i)
+        return None
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while pending or running:
+            while len(running) < workers:
+                j = next_job()
+                if j is None:
+                    break
+                try:
+                    f = pool.submit(_run_job, j)
+                except BrokenProcessPool:
+                    # a worker died since the last wait; the jobs it took down fail below
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = ProcessPoolExecutor(max_workers=workers)
+                    f = pool.submit(_run_job, j)
+                j["attempts"] += 1
+                running[f] = j
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for f in finished:
+                j = running.pop(f)
+                try:
+                    res = f.result()
+                except Exception as e:  # BrokenProcessPool when a worker died, e.g. killed for memory
+                    res = {"status": "failed", "error": f"{type(e).__name__}: {e}", "seconds": float("nan")}
+                if res["status"] != "ok" and j["attempts"] <= retries:
+                    pending.append(j)
+                    pending.sort(key=lambda k: k["input_bytes"], reverse=True)
+                    continue
+                done.append({**{k: j[k] for k in ("symbol", "session_date", "csv_path", "out_dir", "input_bytes", "attempts")}, **res})
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    status = pd.DataFrame(done, columns=STATUS_COLUMNS)
+    status["session_date"] = status["session_date"].astype(str)
+    status["finished_at"] = pd.Timestamp.now(tz="UTC").isoformat()
+    path = out / "batch_status.csv"
+    if path.exists():
+        old = pd.read_csv(path, dtype={"session_date": str})
+        keep = ~old.set_index(STATUS_KEY).index.isin(status.set_index(STATUS_KEY).index)
+        status = pd.concat([old[keep], status], ignore_index=True)
+    status = status.sort_values(STATUS_KEY).reset_index(drop=True)
+    status.to_csv(path, index=False)
+    return status
@@ -0,0 +1,141 @@
+from __future__ import annotations
+import json
+import pathlib
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .arbitrage import scan_cycles
+from .fx_pipeline import build_fx_panels
+from .book import build_l2_snapshots
+from .metrics import build_l2_by_bucket, depth_near_touch, depth_profile, prepare_session, price_impact_by_minute
+from .profiling import RunProfile
+from .synthetic import synthetic_ebs, synthetic_mbo
+
+BENCH_PAIRS = ["EUR/USD", "USD/JPY", "EUR/JPY"]
+BENCH_SYMBOL = "SYNT"
+BENCH_DATE = "2025-07-22"
+
+# a case runs once and returns its input events and output rows
+Case = Tuple[str, Callable[[], Dict[str, int]]]
+
+def _equity_cases(mbo: pd.DataFrame) -> List[Case]:
+    trades = mbo[mbo["action"] == "T"]
+    got: Dict[str, object] = {}
+    def l2(bucket):
+        def run():
+            got[bucket] = build_l2_by_bucket(mbo, bucket)
+            return {"events": len(mbo), "rows": len(got[bucket])}
+        return run
+    def snapshots():
+        got["second_snaps"] = build_l2_snapshots(mbo, ["second"])["second"]
+        return {"events": len(mbo), "rows": len(got["second_snaps"])}
+    def depth():
+        return {"events": len(got["minute"]), "rows": len(depth_near_touch(got["minute"], multiple=2.0))}
+    def profile():
+        rows = len(depth_profile(got["second_snaps"], spread="rolling", window="5min"))
+        return {"events": len(got["second"]), "rows": rows}
+    def impact():
+        return {"events": len(trades), "rows": len(price_impact_by_minute(trades, got["second"], horizon_seconds=5))}
+    return [
+        ("build_l2_by_bucket_minute", l2("minute")),
+        ("build_l2_by_bucket_second", l2("second")),
+        ("build_l2_snapshots_second", snapshots),
+        ("depth_near_touch", depth),
+        ("depth_profile", profile),
+        ("price_impact_by_minute", impact),
+    ]
+
+def _fx_cases(order_csv: str, trade_csv: str, n_records: int) -> List[Case]:
+    got: Dict[str, pd.DataFrame] = {}
+    def panels():
+        got.update(build_fx_panels(order_csv, trade_csv, BENCH_PAIRS))
+        return {"events": n_records, "rows": len(got["tob"])}
+    def scan():
+        return {"events": len(got["tob"]), "rows": len(scan_cycles(got["tob"], BENCH_PAIRS, freq="1s")[1])}
+    return [("build_fx_panels", panels), ("scan_cycles", scan)]
+
+def _traced_peak_mb(fn: Callable[[], Dict[str, int]]) -> float:
+    own = not tracemalloc.is_tracing()
+    if own:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        if own:
+            tracemalloc.stop()
+
+def _run_cases(prof: RunProfile, cases: List[Case], scale: int, repeat: int, memory: bool) -> None:
+    for name, fn in cases:
+        recs = []
+        for r in range(repeat):
+            with prof.stage(name, scale=scale, repeat=r) as st:
+                st.update(fn())
+            recs.append(prof.stages[-1])
+        if memory:
+            peak = _traced_peak_mb(fn)
+            for rec in recs:
+                rec["py_peak_mb"] = peak
+
+def run_benchmarks(
+    scales: Iterable[int] = (1, 10, 100),
+    base_events: int = 20_000,
+    base_fx_records: int = 5_000,
+    seed: int = 0,
+    repeat: int = 1,
+    memory: bool = True,
+    work_dir: Optional[str] = None,
+) -> RunProfile:
+    """Time the equity and FX hot paths on seeded synthetic sessions at several volumes."""
+    scales = [int(s) for s in scales]
+    prof = RunProfile("benchmarks", scales=scales, base_events=base_events, base_fx_records=base_fx_records,
+                      seed=seed, repeat=repeat, memory=memory)
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        for s in scales:
+            raw = synthetic_mbo(s * base_events, BENCH_SYMBOL, BENCH_DATE, seed=seed)
+            mbo = prepare_session(raw, BENCH_SYMBOL, BENCH_DATE)
+            del raw
+            _run_cases(prof, _equity_cases(mbo), s, repeat, memory)
+            del mbo
+
+            orders, trades = synthetic_ebs(s * base_fx_records, BENCH_PAIRS, BENCH_DATE, seed=seed)
+            order_csv, trade_csv = f"{tmp}/orders_{s}.csv", f"{tmp}/trades_{s}.csv"
+            orders.to_csv(order_csv, index=False)
+            trades.to_csv(trade_csv, index=False)
+            n = len(orders)
+            del orders, trades
+            _run_cases(prof, _fx_cases(order_csv, trade_csv, n), s, repeat, memory)
+    return prof
+
+# ---------- baselines
+
+def summarize(report: Dict[str, object]) -> pd.DataFrame:
+    """Best of the repeats per (stage, scale) from a benchmark report."""
+    df = pd.DataFrame(report["stages"])
+    agg = {"wall_sec": "min", "cpu_sec": "min", "events": "first", "rows": "first"}
+    if "py_peak_mb" in df:
+        agg["py_peak_mb"] = "max"
+    out = df.groupby(["stage", "scale"], sort=False).agg(agg)
+    out["events_per_sec"] = out["events"] / out["wall_sec"]
+    return out
+
+def compare_baseline(report: Dict[str, object], baseline: Dict[str, object], tolerance: float = 0.25) -> pd.DataFrame:
+    """Current against baseline per (stage, scale); slower or bigger by more than tolerance is a regression."""
+    keys = ("base_events", "base_fx_records", "seed")
+    mine, theirs = ({k: r["params"].get(k) for k in keys} for r in (report, baseline))
+    if mine != theirs:
+        raise ValueError(f"benchmark inputs differ from the baseline: {mine} vs {theirs}")
+    cur, base = summarize(report), summarize(baseline)
+    cols = [c for c in ("wall_sec", "py_peak_mb") if c in cur and c in base]
+    out = cur[cols].join(base[cols], rsuffix="_base", how="outer")
+    for c in cols:
+        out[f"{c}_ratio"] = out[c] / out[f"{c}_base"]
+    out["regression"] = (out[[f"{c}_ratio" for c in cols]] > 1 + tolerance).any(axis=1)
+    return out
+
+def load_report(path) -> Dict[str, object]:
+    return json.loads(pathlib.Path(path).read_text())
@@ -0,0 +1,390 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# prices are held as integer ticks of 1e-9 dollars, the Databento fixed point unit
+PRICE_SCALE = 1_000_000_000
+
+L2_COLUMNS = [
+    "ts", "side", "price", "depth",
+    "best_bid", "best_ask", "best_bid_depth", "best_ask_depth", "spread",
+]
+
+def to_ticks(px, price_scale: int = PRICE_SCALE) -> np.ndarray:
+    return np.rint(np.asarray(px, dtype=float) * price_scale).astype(np.int64)
+
+def from_ticks(ticks, price_scale: int = PRICE_SCALE):
+    return np.asarray(ticks, dtype=float) / price_scale
+
+def _int64s(a: array) -> np.ndarray:
+    return np.frombuffer(a, dtype=np.int64) if len(a) else np.empty(0, dtype=np.int64)
+
+# ---------- price ladder and order book
+
+class PriceLadder:
+    """One side of the book: depth per integer tick plus a sorted list of live ticks."""
+
+    __slots__ = ("is_bid", "depth", "ticks")
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self.depth: Dict[int, int] = {}
+        self.ticks: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ticks)
+
+    def change(self, tick: int, qty: int) -> None:
+        d = self.depth
+        q = d.get(tick)
+        if q is None:
+            if qty > 0:
+                d[tick] = qty
+                insort(self.ticks, tick)
+            return
+        q += qty
+        if q > 0:
+            d[tick] = q
+        else:
+            del d[tick]
+            del self.ticks[bisect_left(self.ticks, tick)]
+
+    def set(self, tick: int, qty: int) -> None:
+        """Replace the depth at a level, as in price-level (market by price) feeds."""
+        self.change(tick, qty - self.depth.get(tick, 0))
+
+    def copy(self) -> "PriceLadder":
+        out = PriceLadder(self.is_bid)
+        out.depth = self.depth.copy()
+        out.ticks = self.ticks.copy()
+        return out
+
+    def best(self) -> Tuple[Optional[int], int]:
+        if not self.ticks:
+            return None, 0
+        t = self.ticks[-1] if self.is_bid else self.ticks[0]
+        return t, self.depth[t]
+
+    def levels(self) -> List[Tuple[int, int]]:
+        ticks = reversed(self.ticks) if self.is_bid else self.ticks
+        d = self.depth
+        return [(t, d[t]) for t in ticks]
+
+class OrderBook:
+    """Order by order book keyed on order id, aggregated into two price ladders."""
+
+    __slots__ = ("orders", "bids", "asks")
+
+    def __init__(self):
+        self.orders: Dict[int, Tuple[bool, int, int]] = {}
+        self.bids = PriceLadder(True)
+        self.asks = PriceLadder(False)
+
+    def copy(self) -> "OrderBook":
+        # order tuples are immutable, so shallow copies are independent books
+        out = OrderBook.__new__(OrderBook)
+        out.orders = self.orders.copy()
+        out.bids = self.bids.copy()
+        out.asks = self.asks.copy()
+        return out
+
+    def _ladder(self, is_bid: bool) -> PriceLadder:
+        return self.bids if is_bid else self.asks
+
+    def add(self, oid: int, is_bid: bool, tick: int, size: int) -> None:
+        old = self.orders.pop(oid, None)
+        if old is not None:
+            self._ladder(old[0]).change(old[1], -old[2])
+        self.orders[oid] = (is_bid, tick, size)
+        self._ladder(is_bid).change(tick, size)
+
+    def cancel(self, oid: int, size: int) -> None:
+        old = self.orders.get(oid)
+        if old is None:
+            return
+        is_bid, tick, q_old = old
+        dq = min(size, q_old)
+        self._ladder(is_bid).change(tick, -dq)
+        if q_old - dq > 0:
+            self.orders[oid] = (is_bid, tick, q_old - dq)
+        else:
+            del self.orders[oid]
+
+    def modify(self, oid: int, is_bid: bool, tick: int, size: int) -> None:
+        if oid in self.orders:
+            self.add(oid, is_bid, tick, size)
+
+    def apply(self, action: str, oid: int, is_bid: bool, tick: int, size: int) -> None:
+        if action == "A" or action == "F":
+            self.add(oid, is_bid, tick, size)
+        elif action == "C":
+            self.cancel(oid, size)
+        elif action == "R":
+            self.modify(oid, is_bid, tick, size)
+
+    def best_bid(self) -> Tuple[Optional[int], int]:
+        return self.bids.best()
+
+    def best_ask(self) -> Tuple[Optional[int], int]:
+        return self.asks.best()
+
+# ---------- columnar snapshot store
+
+class L2Snapshots:
+    """Book captures at bucket boundaries: top of book per bucket plus flat per side level arrays."""
+
+    def __init__(
+        self,
+        ts: pd.api.extensions.ExtensionArray,
+        tob: np.ndarray,
+        ask_start: np.ndarray,
+        ask_count: np.ndarray,
+        bid_start: np.ndarray,
+        bid_count: np.ndarray,
+        ask_ticks: np.ndarray,
+        ask_depth: np.ndarray,
+        bid_ticks: np.ndarray,
+        bid_depth: np.ndarray,
+        price_scale: int = PRICE_SCALE,
+    ):
+        self.ts = ts
+        self.tob = tob
+        self.ask_start, self.ask_count = ask_start, ask_count
+        self.bid_start, self.bid_count = bid_start, bid_count
+        self.ask_ticks, self.ask_depth = ask_ticks, ask_depth
+        self.bid_ticks, self.bid_depth = bid_ticks, bid_depth
+        self.price_scale = price_scale
+
+    def __len__(self) -> int:
+        return len(self.tob)
+
+    def take(self, rows: np.ndarray, ts=None) -> "L2Snapshots":
+        return L2Snapshots(
+            self.ts[rows] if ts is None else ts,
+            self.tob[rows],
+            self.ask_start[rows], self.ask_count[rows],
+            self.bid_start[rows], self.bid_count[rows],
+            self.ask_ticks, self.ask_depth, self.bid_ticks, self.bid_depth,
+            self.price_scale,
+        )
+
+    def top_of_book(self) -> pd.DataFrame:
+        best_bid = from_ticks(self.tob[:, 0], self.price_scale)
+        best_ask = from_ticks(self.tob[:, 1], self.price_scale)
+        tob = pd.DataFrame({
+            "best_bid": best_bid,
+            "best_ask": best_ask,
+            "best_bid_depth": self.tob[:, 2],
+            "best_ask_depth": self.tob[:, 3],
+            "spread": best_ask - best_bid,
+        }, index=pd.Index(self.ts, name="ts"))
+        tob["mid_price"] = (tob["best_bid"] + tob["best_ask"]) * 0.5
+        tob["rel_spread"] = tob["spread"] / tob["mid_price"]
+        return tob
+
+    def levels(self, side: str, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Dense (buckets, n) price and depth arrays for the best n levels of one side."""
+        if side == "A":
+            start, count, ticks, depth = self.ask_start, self.ask_count, self.ask_ticks, self.ask_depth
+        else:
+            start, count, ticks, depth = self.bid_start, self.bid_count, self.bid_ticks, self.bid_depth
+        k = np.arange(n)
+        live = k[None, :] < count[:, None]
+        idx = np.where(live, start[:, None] + k[None, :], 0)
+        if ticks.size == 0:
+            return np.full(live.shape, np.nan), np.zeros(live.shape, dtype=np.int64)
+        px = np.where(live, from_ticks(ticks[idx], self.price_scale), np.nan)
+        dq = np.where(live, depth[idx], 0)
+        return px, dq
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long frame with one row per live level per bucket, asks then bids."""
+        n_ask, n_bid = self.ask_count, self.bid_count
+        rep = n_ask + n_bid
+        within = np.arange(int(rep.sum())) - np.repeat(np.cumsum(rep) - rep, rep)
+        is_ask = within < np.repeat(n_ask, rep)
+        ticks = np.empty(within.size, dtype=np.int64)
+        depth = np.empty(within.size, dtype=np.int64)
+        ai = (np.repeat(self.ask_start, rep) + within)[is_ask]
+        bi = (np.repeat(self.bid_start - n_ask, rep) + within)[~is_ask]
+        ticks[is_ask], depth[is_ask] = self.ask_ticks[ai], self.ask_depth[ai]
+        ticks[~is_ask], depth[~is_ask] = self.bid_ticks[bi], self.bid_depth[bi]
+
+        best_bid = np.repeat(from_ticks(self.tob[:, 0], self.price_scale), rep)
+        best_ask = np.repeat(from_ticks(self.tob[:, 1], self.price_scale), rep)
+        l2 = pd.DataFrame({
+            "ts": self.ts[np.repeat(np.arange(len(self)), rep)],
+            "side": np.where(is_ask, "A", "B"),
+            "price": from_ticks(ticks, self.price_scale),
+            "depth": depth,
+            "best_bid": best_bid,
+            "best_ask": best_ask,
+            "best_bid_depth": np.repeat(self.tob[:, 2], rep),
+            "best_ask_depth": np.repeat(self.tob[:, 3], rep),
+            "spread": best_ask - best_bid,
+        }, columns=L2_COLUMNS)
+        l2["mid_price"] = (l2["best_bid"] + l2["best_ask"]) * 0.5
+        l2["rel_spread"] = l2["spread"] / l2["mid_price"]
+        return l2.set_index("ts").sort_index(kind="stable")
+
+# ---------- replay
+
+def _event_columns(mbo: pd.DataFrame, price_scale: int):
+    return (
+        mbo["action"].tolist(),
+        mbo["order_id"].astype(np.int64).tolist(),
+        (mbo["side"] == "B").tolist(),
+        to_ticks(mbo["px"], price_scale).tolist(),
+        mbo["size"].astype(np.int64).tolist(),
+    )
+
+def _as_int64(labels: pd.Series) -> np.ndarray:
+    v = np.asarray(labels.values)
+    return v.view(np.int64) if v.dtype.kind == "M" else v.astype(np.int64)
+
+def _boundaries(labels: pd.Series) -> np.ndarray:
+    cm = np.maximum.accumulate(_as_int64(labels))
+    return np.flatnonzero(cm[1:] > cm[:-1]) + 1
+
+BUCKET_ALIASES = {"minute": "1min", "second": "1s"}
+
+def bucket_labels(mbo: pd.DataFrame, resolution: str) -> pd.Series:
+    if resolution in BUCKET_ALIASES and resolution in mbo.columns:
+        return mbo[resolution]
+    return mbo["ts_et"].dt.floor(BUCKET_ALIASES.get(resolution, resolution))
+
+def event_ns(mbo: pd.DataFrame) -> np.ndarray:
+    return mbo["ts"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+_NO_TICK = np.iinfo(np.int64).min
+
+class TopOfBookTape:
+    """Best bid and ask after every event that moves them, NaN on an empty side."""
+
+    def __init__(self, event_ts: np.ndarray, pos: np.ndarray, bid: np.ndarray, ask: np.ndarray, price_scale: int = PRICE_SCALE):
+        self.event_ts = event_ts
+        self.pos = pos
+        self.bid = np.where(bid == _NO_TICK, np.nan, from_ticks(bid, price_scale))
+        self.ask = np.where(ask == _NO_TICK, np.nan, from_ticks(ask, price_scale))
+        self.mid = (self.bid + self.ask) * 0.5
+        self.price_scale = price_scale
+
+    def __len__(self) -> int:
+        return len(self.pos)
+
+    def _at_change(self, j: np.ndarray, values: np.ndarray) -> np.ndarray:
+        return np.where(j >= 0, values[np.maximum(j, 0)], np.nan) if len(values) else np.full(np.shape(j), np.nan)
+
+    def mid_before(self, event_idx: np.ndarray) -> np.ndarray:
+        """Mid in force just before each event index, i.e. after all earlier events."""
+        return self._at_change(np.searchsorted(self.pos, event_idx, side="left") - 1, self.mid)
+
+    def mid_at(self, t_ns: np.ndarray) -> np.ndarray:
+        """Mid after every event stamped at or before t_ns (int64 ns, any shape)."""
+        last = np.searchsorted(self.event_ts, t_ns, side="right") - 1
+        j = np.searchsorted(self.pos, last, side="right") - 1
+        return self._at_change(np.where(last >= 0, j, -1), self.mid)
+
+    def to_frame(self) -> pd.DataFrame:
+        def to_tick(p: np.ndarray) -> np.ndarray:
+            return np.where(np.isnan(p), _NO_TICK, np.rint(np.nan_to_num(p) * self.price_scale)).astype(np.int64)
+
+        return pd.DataFrame({"pos": self.pos, "bid": to_tick(self.bid), "ask": to_tick(self.ask)})
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, event_ts: np.ndarray, price_scale: int = PRICE_SCALE) -> "TopOfBookTape":
+        return cls(event_ts, df["pos"].to_numpy(np.int64), df["bid"].to_numpy(np.int64), df["ask"].to_numpy(np.int64), price_scale)
+
+def _replay(mbo: pd.DataFrame, positions: np.ndarray, price_scale: int, max_levels: Optional[int], tape: bool = False):
+    """Replay the events once, capturing the book just before each position and optionally the top of book tape."""
+    act, oid, is_bid, tick, size = _event_columns(mbo, price_scale)
+
+    book = OrderBook()
+    apply = book.apply
+    asks, bids = book.asks, book.bids
+    snap_pos = array("q")
+    tob = array("q")
+    n_ask = array("q")
+    n_bid = array("q")
+    ask_t, ask_q, bid_t, bid_q = array("q"), array("q"), array("q"), array("q")
+    tape_pos, tape_b, tape_a = array("q"), array("q"), array("q")
+    last_b = last_a = None
+
+    n = len(act)
+    start = 0
+    for stop in positions.tolist() + ([n] if tape else []):
+        if tape:
+            for i in range(start, stop):
+                apply(act[i], oid[i], is_bid[i], tick[i], size[i])
+                b = bids.ticks[-1] if bids.ticks else _NO_TICK
+                a = asks.ticks[0] if asks.ticks else _NO_TICK
+                if b != last_b or a != last_a:
+                    tape_pos.append(i)
+                    tape_b.append(b)
+                    tape_a.append(a)
+                    last_b, last_a = b, a
+        else:
+            for i in range(start, stop):
+                apply(act[i], oid[i], is_bid[i], tick[i], size[i])
+        start = stop
+        if stop == n or not asks.ticks or not bids.ticks:
+            continue
+        at = asks.ticks[:max_levels]
+        bt = bids.ticks[::-1][:max_levels]
+        ask_t.extend(at)
+        ask_q.extend(map(asks.depth.__getitem__, at))
+        bid_t.extend(bt)
+        bid_q.extend(map(bids.depth.__getitem__, bt))
+        snap_pos.append(stop)
+        tob.extend((bt[0], at[0], bids.depth[bt[0]], asks.depth[at[0]]))
+        n_ask.append(len(at))
+        n_bid.append(len(bt))
+
+    n_ask, n_bid = _int64s(n_ask), _int64s(n_bid)
+    snaps = L2Snapshots(
+        None,
+        _int64s(tob).reshape(-1, 4),
+        np.cumsum(n_ask) - n_ask, n_ask,
+        np.cumsum(n_bid) - n_bid, n_bid,
+        _int64s(ask_t), _int64s(ask_q), _int64s(bid_t), _int64s(bid_q),
+        price_scale,
+    )
+    tob_tape = None
+    if tape:
+        tob_tape = TopOfBookTape(event_ns(mbo), _int64s(tape_pos), _int64s(tape_b), _int64s(tape_a), price_scale)
+    return _int64s(snap_pos), snaps, tob_tape
+
+def _build(mbo, resolutions, price_scale, max_levels, tape):
+    resolutions = list(resolutions)
+    labels = {r: bucket_labels(mbo, r) for r in resolutions}
+    bounds = {r: _boundaries(labels[r]) for r in resolutions}
+    union = np.unique(np.concatenate([np.empty(0, np.int64)] + list(bounds.values())))
+    snap_pos, snaps, tob_tape = _replay(mbo, union, price_scale, max_levels, tape)
+
+    out: Dict[str, L2Snapshots] = {}
+    for r in resolutions:
+        rows = np.flatnonzero(np.isin(snap_pos, bounds[r]))
+        out[r] = snaps.take(rows, labels[r].array[snap_pos[rows]])
+    return out, tob_tape
+
+def replay_book(
+    mbo: pd.DataFrame,
+    resolutions: Iterable[str] = ("second", "minute"),
+    price_scale: int = PRICE_SCALE,
+    max_levels: Optional[int] = None,
+) -> Tuple[Dict[str, L2Snapshots], TopOfBookTape]:
+    """Bucket snapshots and the event-time top-of-book tape from one replay."""
+    return _build(mbo, resolutions, price_scale, max_levels, tape=True)
+
+def build_l2_snapshots(
+    mbo: pd.DataFrame,
+    resolutions: Iterable[str] = ("second", "minute"),
+    price_scale: int = PRICE_SCALE,
+    max_levels: Optional[int] = None,
+) -> Dict[str, L2Snapshots]:
+    """L2 snapshots at several bucket resolutions from a single replay."""
+    return _build(mbo, resolutions, price_scale, max_levels, tape=False)[0]
@@ -0,0 +1,131 @@
+from __future__ import annotations
+import datetime as dt
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .book import PRICE_SCALE, OrderBook, _boundaries, _event_columns, event_ns, from_ticks
+
+TimeLike = Union[str, dt.time, pd.Timestamp, int]
+
+class BookIndex:
+    """Point-in-time access to the book from checkpoints taken during one replay."""
+
+    def __init__(
+        self,
+        mbo: pd.DataFrame,
+        every_events: Optional[int] = 1_000,
+        every_seconds: Optional[float] = None,
+        price_scale: int = PRICE_SCALE,
+    ):
+        act, oid, is_bid, tick, size = _event_columns(mbo, price_scale)
+        n = len(act)
+        self.price_scale = price_scale
+        self.tz = mbo["ts_et"].dt.tz
+        self.session_date = mbo["ts_et"].iloc[0].date() if n else None
+        self.event_ts = event_ns(mbo)
+
+        marks = [np.arange(0, n, every_events or n or 1, dtype=np.int64)]
+        if every_seconds:
+            step = int(round(every_seconds * 1e9))
+            marks.append(_boundaries(pd.Series(self.event_ts // step)))
+        self.positions: List[int] = np.unique(np.concatenate(marks + [np.zeros(1, np.int64)])).tolist()
+
+        book = OrderBook()
+        apply = book.apply
+        self.checkpoints: List[OrderBook] = []
+        start = 0
+        for stop in self.positions:
+            for i in range(start, stop):
+                apply(act[i], oid[i], is_bid[i], tick[i], size[i])
+            start = stop
+            self.checkpoints.append(book.copy())
+
+        self._act = np.asarray(act, dtype=object)
+        self._oid = np.asarray(oid, dtype=np.int64)
+        self._is_bid = np.asarray(is_bid, dtype=bool)
+        self._tick = np.asarray(tick, dtype=np.int64)
+        self._size = np.asarray(size, dtype=np.int64)
+        self._cursor: Optional[Tuple[int, OrderBook]] = None
+
+    def __len__(self) -> int:
+        return len(self.event_ts)
+
+    def _to_ns(self, t: TimeLike) -> int:
+        if isinstance(t, (int, np.integer)):
+            return int(t)
+        if isinstance(t, str):
+            try:
+                t = dt.time.fromisoformat(t)
+            except ValueError:
+                pass
+        if isinstance(t, dt.time):
+            t = dt.datetime.combine(self.session_date, t)
+        ts = pd.Timestamp(t)
+        if ts.tzinfo is None:
+            ts = ts.tz_localize(self.tz)
+        return ts.as_unit("ns").value
+
+    def book_after(self, n_events: int) -> OrderBook:
+        """Book after the first n_events events, as a copy the index never touches again."""
+        return self._book_after(n_events).copy()
+
+    def _book_after(self, n_events: int) -> OrderBook:
+        # the cursor book is advanced by later queries, so it only goes to read-only callers
+        n_events = int(min(max(n_events, 0), len(self)))
+        c = bisect_right(self.positions, n_events) - 1
+        if self._cursor is not None and self.positions[c] <= self._cursor[0] <= n_events:
+            start, book = self._cursor
+        else:
+            start, book = self.positions[c], self.checkpoints[c].copy()
+        apply = book.apply
+        seg = slice(start, n_events)
+        for a, o, b, t, q in zip(
+            self._act[seg].tolist(), self._oid[seg].tolist(), self._is_bid[seg].tolist(),
+            self._tick[seg].tolist(), self._size[seg].tolist(),
+        ):
+            apply(a, o, b, t, q)
+        self._cursor = (n_events, book)
+        return book
+
+    def book_at(self, t: TimeLike) -> OrderBook:
+        """Book after every event stamped at or before t."""
+        return self.book_after(self._count_at(t))
+
+    def _count_at(self, t: TimeLike) -> int:
+        return int(np.searchsorted(self.event_ts, self._to_ns(t), side="right"))
+
+    def best(self, t: TimeLike) -> Dict[str, float]:
+        book = self._book_after(self._count_at(t))
+        (bb, bq), (ba, aq) = book.best_bid(), book.best_ask()
+
+        def to_px(x: Optional[int]) -> float:
+            return float(from_ticks(x, self.price_scale)) if x is not None else np.nan
+
+        return {"best_bid": to_px(bb), "best_ask": to_px(ba), "best_bid_depth": bq, "best_ask_depth": aq}
+
+    def depth_within(self, t: TimeLike, k: int, tick_size: float = 0.01) -> Dict[str, int]:
+        """Resting size within k price ticks of the best quote on each side."""
+        book = self._book_after(self._count_at(t))
+        band = int(round(k * tick_size * self.price_scale))
+        out = {}
+        for side, lad in (("B", book.bids), ("A", book.asks)):
+            if not lad.ticks:
+                out[side] = 0
+                continue
+            if lad.is_bid:
+                sel = lad.ticks[bisect_left(lad.ticks, lad.ticks[-1] - band):]
+            else:
+                sel = lad.ticks[:bisect_right(lad.ticks, lad.ticks[0] + band)]
+            out[side] = int(sum(map(lad.depth.__getitem__, sel)))
+        return out
+
+    def levels(self, t: TimeLike, n: Optional[int] = None) -> pd.DataFrame:
+        """Price levels at t, asks ascending then bids descending, best n per side."""
+        book = self._book_after(self._count_at(t))
+        rows = [("A", p, q) for p, q in book.asks.levels()[:n]] + [("B", p, q) for p, q in book.bids.levels()[:n]]
+        out = pd.DataFrame(rows, columns=["side", "price", "depth"])
+        out["price"] = from_ticks(out["price"].to_numpy(np.int64), self.price_scale)
+        return out
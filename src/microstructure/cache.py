@@ -0,0 +1,232 @@
+from __future__ import annotations
+import contextlib
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .book import PRICE_SCALE, L2Snapshots, TopOfBookTape, event_ns, replay_book
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+_SAMPLE_BYTES = 1 << 20
+
+def file_fingerprint(path: str, full: bool = False) -> Dict[str, object]:
+    """Size, mtime and a hash of the first and last MiB (all of it when full) of a source file."""
+    st = os.stat(path)
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        if full or st.st_size <= 2 * _SAMPLE_BYTES:
+            for chunk in iter(lambda: f.read(1 << 24), b""):
+                h.update(chunk)
+        else:
+            h.update(f.read(_SAMPLE_BYTES))
+            f.seek(-_SAMPLE_BYTES, os.SEEK_END)
+            h.update(f.read(_SAMPLE_BYTES))
+    return {"path": str(pathlib.Path(path).resolve()), "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": h.hexdigest()}
+
+# ---------- snapshot store <-> frames
+
+def _snapshots_to_frames(s: L2Snapshots) -> Dict[str, pd.DataFrame]:
+    # levels are compacted into capture order so each resolution is stored on its own
+    def side(start, count, ticks, depth):
+        idx = np.repeat(start, count) + (np.arange(int(count.sum())) - np.repeat(np.cumsum(count) - count, count))
+        return pd.DataFrame({"tick": ticks[idx], "depth": depth[idx]})
+
+    tob = pd.DataFrame({
+        "ts": s.ts,
+        "best_bid": s.tob[:, 0], "best_ask": s.tob[:, 1],
+        "best_bid_depth": s.tob[:, 2], "best_ask_depth": s.tob[:, 3],
+        "ask_count": s.ask_count, "bid_count": s.bid_count,
+    })
+    return {
+        "tob": tob,
+        "asks": side(s.ask_start, s.ask_count, s.ask_ticks, s.ask_depth),
+        "bids": side(s.bid_start, s.bid_count, s.bid_ticks, s.bid_depth),
+    }
+
+def _snapshots_from_frames(frames: Dict[str, pd.DataFrame], price_scale: int) -> L2Snapshots:
+    tob = frames["tob"]
+    n_ask = tob["ask_count"].to_numpy(np.int64)
+    n_bid = tob["bid_count"].to_numpy(np.int64)
+    return L2Snapshots(
+        tob["ts"].array,
+        tob[["best_bid", "best_ask", "best_bid_depth", "best_ask_depth"]].to_numpy(np.int64),
+        np.cumsum(n_ask) - n_ask, n_ask,
+        np.cumsum(n_bid) - n_bid, n_bid,
+        frames["asks"]["tick"].to_numpy(np.int64), frames["asks"]["depth"].to_numpy(np.int64),
+        frames["bids"]["tick"].to_numpy(np.int64), frames["bids"]["depth"].to_numpy(np.int64),
+        price_scale,
+    )
+
+# ---------- cache
+
+class SessionCache:
+    """On-disk Parquet cache of prepared sessions and L2 snapshots, keyed on the source and parameters."""
+
+    def __init__(self, root: str, max_bytes: int = 20 << 30, compression: str = "zstd"):
+        self.root = pathlib.Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self._meta: Dict[pathlib.Path, Dict[str, object]] = {}
+
+    def _ensure(self, entry: pathlib.Path) -> None:
+        # several processes may create the same entry at once, so both steps tolerate a winner
+        entry.mkdir(parents=True, exist_ok=True)
+        if not (entry / "meta.json").exists() and entry in self._meta:
+            tmp = entry / f".meta.json.{os.getpid()}.tmp"
+            tmp.write_text(json.dumps(self._meta[entry], sort_keys=True, indent=1, default=str))
+            os.replace(tmp, entry / "meta.json")
+
+    @contextlib.contextmanager
+    def _locked(self, entry: pathlib.Path, evict: bool = False) -> Iterator[bool]:
+        """Shared lock while an entry is used, or a non-blocking exclusive one to evict it; yields whether it is held."""
+        if not evict:
+            self._ensure(entry)
+        if fcntl is None:
+            yield True
+            return
+        try:
+            f = open(entry / ".lock", "a")
+        except FileNotFoundError:  # evicted by another process
+            yield False
+            return
+        with f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB if evict else fcntl.LOCK_SH)
+            except BlockingIOError:
+                yield False
+                return
+            if not evict:
+                # the entry may have been evicted while this process waited for the lock
+                self._ensure(entry)
+            yield True
+
+    def entry(self, source: str, symbol: str, session_date: str, **params) -> pathlib.Path:
+        fp = file_fingerprint(source)
+        meta = {"source": fp, "symbol": symbol, "session_date": str(session_date), "params": params}
+        key = hashlib.sha1(json.dumps(meta, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        path = self.root / f"symbol={symbol}" / f"date={pd.to_datetime(session_date).date()}" / key
+        self._meta[path] = meta
+        self._ensure(path)
+        return path
+
+    def _read(self, entry: pathlib.Path, name: str) -> Optional[pd.DataFrame]:
+        f = entry / f"{name}.parquet"
+        if not f.exists():
+            return None
+        os.utime(entry)
+        return pd.read_parquet(f)
+
+    def _write(self, entry: pathlib.Path, name: str, df: pd.DataFrame) -> None:
+        tmp = entry / f".{name}.parquet.{os.getpid()}.tmp"
+        df.to_parquet(tmp, compression=self.compression)
+        os.replace(tmp, entry / f"{name}.parquet")
+        os.utime(entry)
+
+    def frame(self, entry: pathlib.Path, name: str, build: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        with self._locked(entry):
+            df = self._read(entry, name)
+            miss = df is None
+            if miss:
+                df = build()
+                self._write(entry, name, df)
+        if miss:
+            self.evict(keep=entry)
+        return df
+
+    def _snapshot_names(self, resolution: str) -> List[str]:
+        return [f"l2_{resolution}_{part}" for part in ("tob", "asks", "bids")]
+
+    def _read_snapshots(self, entry: pathlib.Path, resolutions: List[str], price_scale: int) -> Optional[Dict[str, L2Snapshots]]:
+        if not all((entry / f"{n}.parquet").exists() for r in resolutions for n in self._snapshot_names(r)):
+            return None
+        out = {}
+        for r in resolutions:
+            frames = {part: self._read(entry, n) for part, n in zip(("tob", "asks", "bids"), self._snapshot_names(r))}
+            out[r] = _snapshots_from_frames(frames, price_scale)
+        return out
+
+    def snapshots(
+        self,
+        entry: pathlib.Path,
+        resolutions: Iterable[str],
+        build: Callable[[], Dict[str, L2Snapshots]],
+        price_scale: int = PRICE_SCALE,
+    ) -> Dict[str, L2Snapshots]:
+        resolutions = list(resolutions)
+        with self._locked(entry):
+            out = self._read_snapshots(entry, resolutions, price_scale)
+            miss = out is None
+            if miss:
+                out = build()
+                for r in resolutions:
+                    for n, df in zip(self._snapshot_names(r), _snapshots_to_frames(out[r]).values()):
+                        self._write(entry, n, df)
+        if miss:
+            self.evict(keep=entry)
+        return out
+
+    def book(
+        self,
+        entry: pathlib.Path,
+        mbo: pd.DataFrame,
+        resolutions: Iterable[str],
+        price_scale: int = PRICE_SCALE,
+    ) -> Tuple[Dict[str, L2Snapshots], TopOfBookTape]:
+        """Cached snapshots plus top-of-book tape, replaying the book once on a miss."""
+        resolutions = list(resolutions)
+        with self._locked(entry):
+            tape = self._read(entry, "tob_tape")
+            if tape is not None:
+                snaps = self._read_snapshots(entry, resolutions, price_scale)
+                if snaps is not None:
+                    return snaps, TopOfBookTape.from_frame(tape, event_ns(mbo), price_scale)
+            replayed = replay_book(mbo, resolutions, price_scale)
+            self._write(entry, "tob_tape", replayed[1].to_frame())
+            snaps = self.snapshots(entry, resolutions, lambda: replayed[0], price_scale)
+        return snaps, replayed[1]
+
+    def entries(self) -> List[pathlib.Path]:
+        return [p.parent for p in self.root.glob("symbol=*/date=*/*/meta.json")]
+
+    def size_bytes(self, entry: Optional[pathlib.Path] = None) -> int:
+        base = entry if entry is not None else self.root
+        return sum(f.stat().st_size for f in base.rglob("*") if f.is_file())
+
+    def invalidate(self, symbol: Optional[str] = None, session_date: Optional[str] = None) -> int:
+        sym = f"symbol={symbol}" if symbol else "symbol=*"
+        day = f"date={pd.to_datetime(session_date).date()}" if session_date else "date=*"
+        removed = 0
+        for p in self.root.glob(f"{sym}/{day}/*/meta.json"):
+            with self._locked(p.parent, evict=True) as held:
+                if held:
+                    shutil.rmtree(p.parent, ignore_errors=True)
+                    removed += 1
+        return removed
+
+    def evict(self, keep: Optional[pathlib.Path] = None) -> int:
+        sized = sorted(((e.stat().st_mtime, e, self.size_bytes(e)) for e in self.entries()), key=lambda t: t[0])
+        total = sum(s for _, _, s in sized)
+        removed = 0
+        for _, e, s in sized:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and e == keep:
+                continue
+            with self._locked(e, evict=True) as held:
+                if not held:
+                    continue
+                shutil.rmtree(e, ignore_errors=True)
+            total -= s
+            removed += 1
+        return removed
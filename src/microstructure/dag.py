@@ -0,0 +1,254 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import pathlib
+import pickle
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .profiling import RunProfile
+
+# ---------- content hashes
+
+def _feed(h, obj) -> None:
+    if isinstance(obj, pd.DataFrame):
+        h.update(repr([(str(c), str(t)) for c, t in obj.dtypes.items()]).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    elif isinstance(obj, (pd.Series, pd.Index)):
+        h.update(f"{type(obj).__name__}{obj.dtype}{obj.name}".encode())
+        h.update(pd.util.hash_pandas_object(obj, index=isinstance(obj, pd.Series)).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(f"{obj.dtype}{obj.shape}".encode())
+        h.update(pd.util.hash_array(obj.ravel()).tobytes() if obj.dtype.kind == "O" else np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, pd.api.extensions.ExtensionArray):
+        h.update(pd.util.hash_array(np.asarray(obj)).tobytes())
+    elif isinstance(obj, dict):
+        for k in sorted(obj, key=str):
+            h.update(repr(k).encode())
+            _feed(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for v in obj:
+            _feed(h, v)
+    elif hasattr(obj, "__dict__"):
+        h.update(type(obj).__name__.encode())
+        _feed(h, vars(obj))
+    else:
+        h.update(repr(obj).encode())
+
+def content_hash(obj) -> str:
+    """Stable digest of frames, arrays, containers and plain objects built from them."""
+    h = hashlib.sha1()
+    _feed(h, obj)
+    return h.hexdigest()[:16]
+
+# ---------- stage store
+
+class StageStore:
+    """Memoized stage results, in memory and optionally pickled under a trusted root."""
+
+    def __init__(self, root: Optional[str] = None, max_items: int = 64, max_bytes: int = 10 << 30):
+        self.root = pathlib.Path(root) if root else None
+        if self.root is not None:
+            self.root.mkdir(parents=True, exist_ok=True)
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._mem: "OrderedDict[Tuple[str, str], object]" = OrderedDict()
+        self._digests: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def _dir(self, stage: str, key: str) -> Optional[pathlib.Path]:
+        return self.root / stage / key if self.root is not None else None
+
+    def digest(self, stage: str, key: str) -> Optional[str]:
+        """Digest of a stored result, or None when neither memory nor disk holds it."""
+        with self._lock:
+            if (stage, key) in self._mem:
+                return self._digests[(stage, key)]
+        d = self._dir(stage, key)
+        if d is not None and (d / "value.pkl").exists():
+            return json.loads((d / "meta.json").read_text())["digest"]
+        return None
+
+    def get(self, stage: str, key: str):
+        with self._lock:
+            if (stage, key) in self._mem:
+                self._mem.move_to_end((stage, key))
+                return self._mem[(stage, key)]
+        d = self._dir(stage, key)
+        if d is None or not (d / "value.pkl").exists():
+            raise KeyError((stage, key))
+        with open(d / "value.pkl", "rb") as f:
+            value = pickle.load(f)
+        os.utime(d)
+        self._remember(stage, key, value, json.loads((d / "meta.json").read_text())["digest"])
+        return value
+
+    def _remember(self, stage: str, key: str, value, digest: str) -> None:
+        with self._lock:
+            self._mem[(stage, key)] = value
+            self._digests[(stage, key)] = digest
+            self._mem.move_to_end((stage, key))
+            while len(self._mem) > self.max_items:
+                old, _ = self._mem.popitem(last=False)
+                self._digests.pop(old, None)
+
+    def put(self, stage: str, key: str, value, digest: str, meta: Dict[str, object], persist: bool = True) -> None:
+        self._remember(stage, key, value, digest)
+        d = self._dir(stage, key)
+        if d is None or not persist:
+            return
+        d.mkdir(parents=True, exist_ok=True)
+        tmp = d / ".value.pkl.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        (d / "meta.json").write_text(json.dumps({**meta, "digest": digest}, sort_keys=True, indent=1, default=str))
+        os.replace(tmp, d / "value.pkl")
+        self.evict(keep=d)
+
+    def entries(self) -> List[pathlib.Path]:
+        return [p.parent for p in self.root.glob("*/*/meta.json")] if self.root is not None else []
+
+    def evict(self, keep: Optional[pathlib.Path] = None) -> int:
+        sized = sorted(((e.stat().st_mtime, e, sum(f.stat().st_size for f in e.iterdir())) for e in self.entries()), key=lambda t: t[0])
+        total = sum(s for _, _, s in sized)
+        removed = 0
+        for _, e, s in sized:
+            if total <= self.max_bytes:
+                break
+            if keep is not None and e == keep:
+                continue
+            shutil.rmtree(e, ignore_errors=True)
+            total -= s
+            removed += 1
+        return removed
+
+    def clear(self, stage: Optional[str] = None) -> None:
+        with self._lock:
+            for k in [k for k in self._mem if stage is None or k[0] == stage]:
+                del self._mem[k]
+                self._digests.pop(k, None)
+        if self.root is not None:
+            for e in self.entries():
+                if stage is None or e.parent.name == stage:
+                    shutil.rmtree(e, ignore_errors=True)
+
+# ---------- stage graph
+
+class Stage:
+    __slots__ = ("name", "fn", "inputs", "params", "persist", "hash_output", "version", "counts")
+
+    def __init__(self, name: str, fn: Callable, inputs: Sequence[str] = (), params: Sequence[str] = (),
+                 persist: bool = True, hash_output: bool = True, version: int = 1,
+                 counts: Optional[Callable[..., Dict[str, object]]] = None):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.params = tuple(params)
+        self.persist = persist
+        self.hash_output = hash_output
+        self.version = version
+        self.counts = counts
+
+class StageGraph:
+    """Declared stages memoized on their parameters and input content, run on up to workers threads."""
+
+    def __init__(self, store: Optional[StageStore] = None, workers: int = 2):
+        self.store = store or StageStore()
+        self.workers = workers
+        self.stages: Dict[str, Stage] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def add(self, name: str, fn: Callable, inputs: Sequence[str] = (), params: Sequence[str] = (), **options) -> "StageGraph":
+        missing = [i for i in inputs if i not in self.stages]
+        if missing:
+            raise ValueError(f"stage {name!r} depends on undeclared stages {missing}")
+        self.stages[name] = Stage(name, fn, inputs, params, **options)
+        return self
+
+    def upstream(self, targets: Iterable[str]) -> List[str]:
+        """Targets and everything they depend on, in declaration (topological) order."""
+        need, stack = set(), list(targets)
+        while stack:
+            n = stack.pop()
+            if n not in need:
+                need.add(n)
+                stack.extend(self.stages[n].inputs)
+        return [n for n in self.stages if n in need]
+
+    def _key(self, st: Stage, params: Dict[str, object], digests: Dict[str, str]) -> Tuple[str, Dict[str, object]]:
+        missing = [p for p in st.params if p not in params]
+        if missing:
+            raise KeyError(f"stage {st.name!r} needs parameters {missing}")
+        meta = {
+            "stage": st.name,
+            "version": st.version,
+            "params": {p: params[p] for p in st.params},
+            "inputs": {i: digests[i] for i in st.inputs},
+        }
+        return hashlib.sha1(json.dumps(meta, sort_keys=True, default=str).encode()).hexdigest()[:16], meta
+
+    def _value(self, name: str, keys: Dict[str, str], metas: Dict[str, Dict], params: Dict[str, object], prof: RunProfile):
+        # one thread computes a missing value while the others wait for it
+        with self._guard:
+            lock = self._locks.setdefault((name, keys[name]), threading.Lock())
+        with lock:
+            try:
+                return self.store.get(name, keys[name])
+            except KeyError:
+                return self._compute(self.stages[name], keys, metas, params, prof)[1]
+
+    def _compute(self, st: Stage, keys, metas, params, prof: RunProfile) -> Tuple[str, object]:
+        args = {i: self._value(i, keys, metas, params, prof) for i in st.inputs}
+        with prof.stage(st.name, cached=False) as rec:
+            value = st.fn(**args, **{p: params[p] for p in st.params})
+            if st.counts is not None:
+                rec.update(st.counts(value, **args))
+            elif hasattr(value, "__len__"):
+                rec["rows"] = len(value)
+        digest = content_hash(value) if st.hash_output else keys[st.name]
+        self.store.put(st.name, keys[st.name], value, digest, metas[st.name], persist=st.persist)
+        return digest, value
+
+    def run(self, params: Dict[str, object], targets: Optional[Iterable[str]] = None, profile: Optional[RunProfile] = None) -> Dict[str, object]:
+        """Resolve targets (every stage by default) and return their values."""
+        prof = profile or RunProfile("stages")
+        targets = list(targets or self.stages)
+        pending = self.upstream(targets)
+        digests: Dict[str, str] = {}
+        keys: Dict[str, str] = {}
+        metas: Dict[str, Dict] = {}
+        running: Dict[Future, str] = {}
+        # cpu time and tracemalloc peaks are process wide, so profiled runs keep stages apart
+        serial = self.workers <= 1 or prof.profiler is not None or prof.trace_memory
+        with ThreadPoolExecutor(max_workers=1 if serial else self.workers) as pool:
+            while pending or running:
+                for name in [n for n in pending if all(i in digests for i in self.stages[n].inputs)]:
+                    pending.remove(name)
+                    st = self.stages[name]
+                    keys[name], metas[name] = self._key(st, params, digests)
+                    if not st.hash_output:
+                        digests[name] = keys[name]
+                        continue
+                    hit = self.store.digest(name, keys[name])
+                    if hit is not None:
+                        with prof.stage(name, cached=True):
+                            digests[name] = hit
+                    elif serial:
+                        digests[name] = self._compute(st, keys, metas, params, prof)[0]
+                    else:
+                        running[pool.submit(self._compute, st, keys, metas, params, prof)] = name
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for f in finished:
+                    digests[running.pop(f)] = f.result()[0]
+        return {n: self._value(n, keys, metas, params, prof) for n in targets}
@@ -1,22 +1,131 @@
 from __future__ import annotations
 import pathlib
+from typing import Dict, Optional, Sequence
 import pandas as pd
 
+from .bars import build_bars
+from .book import PRICE_SCALE, replay_book
+from .cache import SessionCache, file_fingerprint
+from .dag import StageGraph, StageStore
+from .loaders import load_session
 from .metrics import (
-    prepare_session,
     per_minute_dollar_volume,
     order_counts_per_minute,
     ohlc_per_minute,
     vwap_per_minute,
-    build_l2_by_bucket,
     depth_near_touch,
+    depth_profile,
     price_impact_by_minute,
+    price_impact_curve,
+    price_impact_event_time,
     build_mid_and_px_series,
     log_returns,
     realized_variance,
     acf_np,
+    ccf_fft,
 )
-from .plots import line_series, bar_minute
+from .plots import FigureSet
+from .profiling import RunProfile
+from .store import MetricsStore, with_minute
+from .realized import log_price_panel, realized_measures
+
+RESOLUTIONS = ("minute", "second")
+IMPACT_HORIZONS = tuple(range(1, 61))
+DEPTH_BANDS = (0.5, 1, 2, 5, 10)
+SOURCE_PARAMS = ("csv_path", "source", "symbol", "session_date", "tz", "price_in_nanos")
+OUTPUT_STAGES = ("bars", "tob_min", "depth", "depth_profile", "impact", "impact_curve", "impact_event_time", "series", "realized", "returns", "ccf")
+
+# ---------- stages
+
+def _events(of: str):
+    """Stage counts with the length of input `of` as events and the result length as rows."""
+    return lambda value, **inputs: {"events": len(inputs[of]), "rows": len(value)}
+
+def _levels(resolution: str):
+    def counts(value, book):
+        snaps = book[0][resolution]
+        return {"events": int(snaps.ask_count.sum() + snaps.bid_count.sum()), "rows": len(value)}
+    return counts
+
+def _book_counts(value, mbo) -> Dict[str, object]:
+    snaps, tape = value
+    return {"events": len(mbo), **{f"snapshots_{r}": len(snaps[r]) for r in RESOLUTIONS}, "tape_changes": len(tape)}
+
+def _minute_returns(series: Dict[str, pd.Series]) -> Dict[str, object]:
+    r_mid_1m = log_returns(series["mid_1m"])
+    r_px_1m = log_returns(series["px_1m"])
+    acf = pd.DataFrame({"lag": list(range(1, 21)), "acf_mid": acf_np(r_mid_1m, nlags=20), "acf_px": acf_np(r_px_1m, nlags=20)})
+    return {"rv_mid": realized_variance(r_mid_1m), "rv_px": realized_variance(r_px_1m), "acf": acf}
+
+def _ccf_1s(logp: pd.DataFrame) -> pd.DataFrame:
+    r_1s = logp.diff()
+    lags, cc = ccf_fft(r_1s["mid"], r_1s["px"], nlags=60)
+    return pd.DataFrame({"lag_sec": lags, "ccf_mid_px": cc})
+
+def metric_tables(res: Dict[str, object], tz: str, depth_multiple: float) -> Dict[str, pd.DataFrame]:
+    """Output stage results shaped for the MetricsStore tables."""
+    bars = with_minute(res["bars"], res["bars"].index, tz)
+    tob = with_minute(res["tob_min"], res["tob_min"].index, tz).rename(columns={"best_bid": "bid", "best_ask": "ask"})
+    depth = with_minute(res["depth"].assign(multiple=depth_multiple), "ts", tz)
+    impact = pd.concat([
+        res["impact_curve"].assign(clock="time"),
+        res["impact_event_time"].assign(clock="event"),
+    ], ignore_index=True).rename(columns={"horizon": "horizon_seconds"})
+    impact = with_minute(impact, "minute", tz)
+    ret = res["returns"]
+    realized = res["realized"][1].reset_index()
+    realized["rv_1m"] = realized["series"].map({"mid": ret["rv_mid"], "px": ret["rv_px"]})
+    acf = ret["acf"].melt(id_vars="lag", var_name="series", value_name="acf")
+    acf["series"] = acf["series"].str.removeprefix("acf_")
+    return {"bars": bars, "spread": tob, "depth": depth, "impact": impact, "realized": realized, "acf": acf}
+
+def equity_graph(cache_dir: Optional[str] = None, workers: int = 2) -> StageGraph:
+    """The equity day as a stage graph, memoized under cache_dir when it is set."""
+    cache = SessionCache(cache_dir) if cache_dir else None
+    store = StageStore(str(pathlib.Path(cache_dir) / "stages") if cache_dir else None)
+
+    def entry(csv_path, source, symbol, session_date, tz, price_in_nanos):
+        return cache.entry(csv_path, symbol, session_date, tz=tz, price_in_nanos=price_in_nanos, price_scale=PRICE_SCALE)
+
+    def load(csv_path, source, symbol, session_date, tz, price_in_nanos):
+        def read():
+            return load_session(csv_path, symbol=symbol, session_date=session_date, tz=tz, price_in_nanos=price_in_nanos)
+
+        if cache is None:
+            return read()
+        return cache.frame(entry(csv_path, source, symbol, session_date, tz, price_in_nanos), "events", read)
+
+    def book(mbo, **src):
+        if cache is None:
+            return replay_book(mbo, RESOLUTIONS)
+        return cache.book(entry(**src), mbo, RESOLUTIONS, PRICE_SCALE)
+
+    g = StageGraph(store, workers=workers)
+    g.add("mbo", load, params=SOURCE_PARAMS, persist=False, hash_output=False)
+    g.add("trades", lambda mbo: mbo[mbo["action"] == "T"].copy(), ["mbo"], persist=False, hash_output=False, counts=_events("mbo"))
+    g.add("book", book, ["mbo"], SOURCE_PARAMS, persist=False, hash_output=False, counts=_book_counts)
+    g.add("bars", lambda mbo: build_bars(mbo, "time", "1min"), ["mbo"], counts=_events("mbo"))
+    g.add("tob_min", lambda book: book[0]["minute"].top_of_book()[["best_bid", "best_ask", "spread"]], ["book"])
+    g.add("l2_sec", lambda book: book[0]["second"].top_of_book(), ["book"])
+    g.add("depth", lambda book, depth_multiple: depth_near_touch(book[0]["minute"], multiple=depth_multiple),
+          ["book"], ["depth_multiple"], counts=_levels("minute"))
+    g.add("depth_profile", lambda book, depth_bands: depth_profile(book[0]["second"], depth_bands, spread="rolling", window="5min"),
+          ["book"], ["depth_bands"], counts=_levels("second"))
+    g.add("impact", lambda trades, l2_sec, horizon_seconds: price_impact_by_minute(trades, l2_sec, horizon_seconds=horizon_seconds),
+          ["trades", "l2_sec"], ["horizon_seconds"], counts=_events("trades"))
+    g.add("impact_curve", lambda trades, l2_sec, impact_horizons: price_impact_curve(trades, l2_sec, horizons=impact_horizons),
+          ["trades", "l2_sec"], ["impact_horizons"], counts=_events("trades"))
+    g.add("impact_event_time", lambda mbo, book, impact_horizons: price_impact_event_time(mbo, book[1], horizons=impact_horizons),
+          ["mbo", "book"], ["impact_horizons"], counts=_events("mbo"))
+    g.add("series", lambda l2_sec, trades: build_mid_and_px_series(l2_sec, trades), ["l2_sec", "trades"],
+          counts=lambda value, **_: {"rows": len(value["mid_1s"])})
+    g.add("logp", lambda series: log_price_panel({"mid": series["mid_1s"], "px": series["px_1s"]}, "1s"), ["series"])
+    g.add("realized", lambda logp: realized_measures(logp), ["logp"], counts=lambda value, logp: {"events": len(logp), "rows": len(value[1])})
+    g.add("returns", _minute_returns, ["series"], counts=lambda value, series: {"rows": len(value["acf"])})
+    g.add("ccf", _ccf_1s, ["logp"])
+    return g
+
+# ---------- day
 
 def run_equity_day(
     csv_path: str,
@@ -24,50 +133,94 @@ def run_equity_day(
     session_date: str,
     out_dir: str,
     price_in_nanos: bool = True,
-) -> None:
+    tz: str = "America/New_York",
+    cache_dir: Optional[str] = None,
+    figures: str = "full",
+    plot_workers: int = 1,
+    trace_memory: bool = False,
+    profiler: Optional[str] = None,
+    horizon_seconds: int = 5,
+    depth_multiple: float = 2.0,
+    depth_bands: Sequence[float] = DEPTH_BANDS,
+    graph: Optional[StageGraph] = None,
+    stage_workers: int = 2,
+    metrics_store: Optional[str] = None,
+) -> Dict[str, object]:
+    """Run the equity day through its stage graph and write every output."""
     out = pathlib.Path(out_dir)
     out.mkdir(parents=True, exist_ok=True)
+    figs = FigureSet(figures, workers=plot_workers)
+    prof = RunProfile(f"equities {symbol} {session_date}", trace_memory=trace_memory, profiler=profiler,
+                      csv_path=csv_path, cache=bool(cache_dir), figures=figures,
+                      horizon_seconds=horizon_seconds, depth_multiple=depth_multiple, depth_bands=list(depth_bands),
+                      stage_workers=1 if profiler or trace_memory else stage_workers)
+    graph = graph or equity_graph(cache_dir, workers=stage_workers)
+    params = {
+        "csv_path": csv_path,
+        "source": file_fingerprint(csv_path),
+        "symbol": symbol,
+        "session_date": session_date,
+        "tz": tz,
+        "price_in_nanos": price_in_nanos,
+        "depth_multiple": depth_multiple,
+        "depth_bands": tuple(depth_bands),
+        "horizon_seconds": horizon_seconds,
+        "impact_horizons": IMPACT_HORIZONS,
+    }
+    res = graph.run(params, OUTPUT_STAGES, profile=prof)
+    sym = symbol.lower()
 
-    raw = pd.read_csv(csv_path)
-    mbo = prepare_session(raw, symbol=symbol, session_date=session_date, price_in_nanos=price_in_nanos)
-    trades = mbo[mbo["action"] == "T"].copy()
+    with prof.stage("outputs") as st:
+        bars = res["bars"]
+        bars.to_csv(out / f"{sym}_bars_min.csv")
+        dv = per_minute_dollar_volume(None, bars=bars)
+        figs.bar(dv, f"{symbol} dollar volume per minute", "dollar volume per minute", out / f"{sym}_dv_min.png")
+        order_counts_per_minute(None, bars=bars).to_csv(out / f"{sym}_order_counts.csv", index=True)
+        ohlc_per_minute(None, bars=bars).to_csv(out / f"{sym}_ohlc_min.csv")
+        vwap = vwap_per_minute(None, bars=bars)
+        figs.line(vwap, f"{symbol} vwap per minute", "vwap", out / f"{sym}_vwap_min.png")
 
-    dv = per_minute_dollar_volume(trades)
-    bar_minute(dv, f"{symbol} dollar volume per minute", "dollar volume per minute", out / f"{symbol.lower()}_dv_min.png")
+        res["tob_min"]["spread"].to_csv(out / f"{sym}_spread_min.csv")
+        res["depth"].to_csv(out / f"{sym}_depth_near_touch.csv", index=False)
+        curves = res["depth_profile"].set_index(["ts", "side", "band"])["depth"].unstack(["side", "band"])
+        curves.columns = [f"{side}_{band:g}" for side, band in curves.columns]
+        curves.to_csv(out / f"{sym}_depth_profile_1s.csv")
 
-    counts = order_counts_per_minute(mbo)
-    counts.to_csv(out / f"{symbol.lower()}_order_counts.csv", index=True)
+        impact = res["impact"]
+        beta = f"beta_{horizon_seconds}s"
+        impact.to_csv(out / f"{sym}_impact.csv", index=False)
+        res["impact_curve"].to_csv(out / f"{sym}_impact_curve.csv", index=False)
+        res["impact_event_time"].to_csv(out / f"{sym}_impact_event_time.csv", index=False)
+        figs.line(impact.set_index("minute")[[beta]].squeeze(), f"{symbol} {horizon_seconds} second price impact", "beta", out / f"{sym}_impact.png")
 
-    ohlc = ohlc_per_minute(trades)
-    ohlc.to_csv(out / f"{symbol.lower()}_ohlc_min.csv")
-    vwap = vwap_per_minute(trades)
-    line_series(vwap, f"{symbol} vwap per minute", "vwap", out / f"{symbol.lower()}_vwap_min.png")
+        series = res["series"]
+        figs.line(series["mid_1s"], f"{symbol} one second midquote", "mid", out / f"{sym}_mid_1s.png")
+        figs.line(series["mid_1m"], f"{symbol} one minute midquote", "mid", out / f"{sym}_mid_1m.png")
+        figs.line(series["px_1s"].dropna(), f"{symbol} one second transaction price", "price", out / f"{sym}_px_1s.png")
+        figs.line(series["px_1m"].dropna(), f"{symbol} one minute transaction price", "price", out / f"{sym}_px_1m.png")
 
-    l2_min = build_l2_by_bucket(mbo, bucket="minute")
-    l2_sec = build_l2_by_bucket(mbo, bucket="second")
-    l2_min[["spread"]].reset_index().groupby("ts").last()["spread"].to_csv(out / f"{symbol.lower()}_spread_min.csv")
+        sig, realized = res["realized"]
+        sig.to_csv(out / f"{sym}_signature.csv")
+        realized.to_csv(out / f"{sym}_realized.csv")
+        figs.signature(sig, f"{symbol} volatility signature", out / f"{sym}_signature.png")
 
-    depth_touch = depth_near_touch(l2_min, multiple=2.0)
-    depth_touch.to_csv(out / f"{symbol.lower()}_depth_near_touch.csv", index=False)
+        ret = res["returns"]
+        with open(out / f"{sym}_variance.txt", "w") as f:
+            f.write(f"midquote RV one minute  {ret['rv_mid']}\n")
+            f.write(f"transaction RV one minute  {ret['rv_px']}\n")
+        ret["acf"].to_csv(out / f"{sym}_acf.csv", index=False)
+        res["ccf"].to_csv(out / f"{sym}_ccf_1s.csv", index=False)
+        st["rows"] = len(bars)
 
-    impact = price_impact_by_minute(trades, l2_sec, horizon_seconds=5)
-    impact.to_csv(out / f"{symbol.lower()}_impact.csv", index=False)
-    line_series(impact.set_index("minute")[["beta_5s"]].squeeze(), f"{symbol} five second price impact", "beta", out / f"{symbol.lower()}_impact.png")
+    if metrics_store:
+        with prof.stage("metrics_store") as st:
+            tables = metric_tables(res, tz, depth_multiple)
+            MetricsStore(metrics_store).write_many(tables, symbol, session_date)
+            st["rows"] = sum(len(t) for t in tables.values())
 
-    series = build_mid_and_px_series(l2_sec, trades)
-    line_series(series["mid_1s"], f"{symbol} one second midquote", "mid", out / f"{symbol.lower()}_mid_1s.png")
-    line_series(series["mid_1m"], f"{symbol} one minute midquote", "mid", out / f"{symbol.lower()}_mid_1m.png")
-    line_series(series["px_1s"].dropna(), f"{symbol} one second transaction price", "price", out / f"{symbol.lower()}_px_1s.png")
-    line_series(series["px_1m"].dropna(), f"{symbol} one minute transaction price", "price", out / f"{symbol.lower()}_px_1m.png")
+    with prof.stage("plotting") as st:
+        st["figures"] = len(figs.jobs)
+        figs.render()
 
-    r_mid_1m = log_returns(series["mid_1m"])
-    r_px_1m = log_returns(series["px_1m"])
-    rv_mid = realized_variance(r_mid_1m)
-    rv_px = realized_variance(r_px_1m)
-    with open(out / f"{symbol.lower()}_variance.txt", "w") as f:
-        f.write(f"midquote RV one minute  {rv_mid}\n")
-        f.write(f"transaction RV one minute  {rv_px}\n")
-
-    ac_mid = acf_np(r_mid_1m, nlags=20)
-    ac_px = acf_np(r_px_1m, nlags=20)
-    pd.DataFrame({"lag": list(range(1, 21)), "acf_mid": ac_mid, "acf_px": ac_px}).to_csv(out / f"{symbol.lower()}_acf.csv", index=False)
+    prof.write(out / f"{sym}_run_report.json")
+    return res
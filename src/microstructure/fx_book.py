@@ -0,0 +1,98 @@
+from __future__ import annotations
+from array import array
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .book import PRICE_SCALE, PriceLadder, _int64s, from_ticks, to_ticks
+
+# EBS BUY_SELL_FLAG on book records: 0 bid, 1 ask
+BID_FLAG = 0
+
+def _deleted(orders: pd.DataFrame, delete_record_types: Iterable) -> np.ndarray:
+    dead = orders["size"].isna().to_numpy() | (orders["size"].fillna(0) <= 0).to_numpy()
+    if "DELETED_TIME" in orders:
+        d = orders["DELETED_TIME"]
+        dead |= (d.notna() & ~d.astype(str).str.strip().isin(["", "0", "nan", "NaT"])).to_numpy()
+    if "RECORD_TYPE" in orders and delete_record_types:
+        dead |= orders["RECORD_TYPE"].isin(list(delete_record_types)).to_numpy()
+    return dead
+
+def replay_fx_book(
+    orders: pd.DataFrame,
+    price_scale: int = PRICE_SCALE,
+    valid_tick_status: Optional[Iterable] = None,
+    delete_record_types: Iterable = (),
+) -> pd.DataFrame:
+    """Rebuild the EBS book per pair in (timestamp, OMDSEQ) order and return top of book after every record."""
+    o = orders.dropna(subset=["timestamp", "price", "side"])
+    if valid_tick_status is not None and "TICK_STATUS" in o:
+        o = o[o["TICK_STATUS"].isin(list(valid_tick_status))]
+    keys = ["pair", "timestamp", "OMDSEQ"] if "OMDSEQ" in o else ["pair", "timestamp"]
+    o = o.sort_values(keys, kind="stable", na_position="last")
+
+    pair_codes, pair_names = pd.factorize(o["pair"], sort=False)
+    is_bid = (o["side"].to_numpy(dtype=float) == BID_FLAG).tolist()
+    tick = to_ticks(o["price"], price_scale).tolist()
+    size = np.rint(o["size"].fillna(0).to_numpy(dtype=float)).astype(np.int64).tolist()
+    dead = _deleted(o, delete_record_types).tolist()
+
+    n = len(tick)
+    none = np.iinfo(np.int64).min
+    bid_t, ask_t, bid_q, ask_q = array("q"), array("q"), array("q"), array("q")
+    starts = np.flatnonzero(np.r_[True, pair_codes[1:] != pair_codes[:-1]]).tolist() + [n]
+    for lo, hi in zip(starts[:-1], starts[1:]):
+        bids, asks = PriceLadder(True), PriceLadder(False)
+        for i in range(lo, hi):
+            # records carry no order id: each sets the size resting at its price level
+            lad = bids if is_bid[i] else asks
+            lad.set(tick[i], 0 if dead[i] else size[i])
+            if bids.ticks:
+                b = bids.ticks[-1]
+                bid_t.append(b)
+                bid_q.append(bids.depth[b])
+            else:
+                bid_t.append(none)
+                bid_q.append(0)
+            if asks.ticks:
+                a = asks.ticks[0]
+                ask_t.append(a)
+                ask_q.append(asks.depth[a])
+            else:
+                ask_t.append(none)
+                ask_q.append(0)
+
+    bt, at = _int64s(bid_t), _int64s(ask_t)
+    tob = pd.DataFrame({
+        "timestamp": o["timestamp"].to_numpy(),
+        "pair": pd.Categorical.from_codes(pair_codes, categories=pair_names),
+        "bid": np.where(bt == none, np.nan, from_ticks(bt, price_scale)),
+        "ask": np.where(at == none, np.nan, from_ticks(at, price_scale)),
+        "bid_size": _int64s(bid_q),
+        "ask_size": _int64s(ask_q),
+    })
+    return tob.sort_values("timestamp", kind="stable").reset_index(drop=True)
+
+def with_mid(tob: pd.DataFrame) -> pd.DataFrame:
+    # crossed or one-sided books have no usable mid or spread
+    ok = (tob["ask"] >= tob["bid"]).to_numpy()
+    return tob.assign(
+        mid=np.where(ok, (tob["bid"] + tob["ask"]) * 0.5, np.nan),
+        spread=np.where(ok, tob["ask"] - tob["bid"], np.nan),
+    )
+
+def fx_top_of_book_grid(tob: pd.DataFrame, freq: str = "1s") -> pd.DataFrame:
+    """Last book state per pair in each bucket, forward filled on a regular (pair, timestamp) grid."""
+    t = tob.assign(bucket=tob["timestamp"].dt.floor(freq))
+    last = t.drop_duplicates(["pair", "bucket"], keep="last")
+    cols = ["bid", "ask", "bid_size", "ask_size"]
+    parts: Dict[str, pd.DataFrame] = {}
+    for p, g in last.groupby("pair", observed=True, sort=False):
+        g = g.set_index("bucket")[cols]
+        grid = pd.date_range(g.index.min(), g.index.max(), freq=freq)
+        parts[p] = g.reindex(grid).ffill()
+    if not parts:
+        return pd.DataFrame(columns=cols + ["mid", "spread"], index=pd.MultiIndex.from_arrays([[], []], names=["pair", "timestamp"]))
+    out = pd.concat(parts, names=["pair", "timestamp"])
+    return with_mid(out)
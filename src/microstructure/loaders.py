@@ -0,0 +1,161 @@
+from __future__ import annotations
+import csv
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+from .metrics import prepare_session, session_bounds
+
+# columns the equity pipeline actually uses, with fixed dtypes so nothing is inferred
+MBO_SCHEMA: Dict[str, pa.DataType] = {
+    "ts_event": pa.int64(),
+    "symbol": pa.string(),
+    "action": pa.string(),
+    "side": pa.string(),
+    "price": pa.float64(),
+    "size": pa.int64(),
+    "order_id": pa.uint64(),
+    "sequence": pa.int64(),
+}
+
+def open_csv_stream(path: str, columns: Dict[str, pa.DataType], block_size: int = 1 << 24) -> pacsv.CSVStreamingReader:
+    # compression is detected from the extension, so .csv.zst and .csv.gz stream directly
+    source = pa.input_stream(str(path), compression="detect")
+    return pacsv.open_csv(
+        source,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        convert_options=pacsv.ConvertOptions(include_columns=list(columns), column_types=columns),
+    )
+
+def read_mbo_session(
+    path: str,
+    symbol: str,
+    session_date: str,
+    tz: str = "America/New_York",
+    columns: Optional[Iterable[str]] = None,
+    block_size: int = 1 << 24,
+) -> pd.DataFrame:
+    """Stream an MBO csv keeping only one symbol's regular session."""
+    cols = {c: MBO_SCHEMA[c] for c in (columns or MBO_SCHEMA)}
+    lo, hi = (b.value for b in session_bounds(session_date, tz))
+    kept = []
+    for batch in open_csv_stream(path, cols, block_size):
+        mask = pc.and_(
+            pc.equal(batch.column("symbol"), symbol),
+            pc.and_(pc.greater_equal(batch.column("ts_event"), lo), pc.less(batch.column("ts_event"), hi)),
+        )
+        part = batch.filter(mask)
+        if part.num_rows:
+            kept.append(part)
+    schema = pa.schema([(c, t) for c, t in cols.items()])
+    return pa.Table.from_batches(kept, schema=schema).to_pandas()
+
+def load_session(
+    path: str,
+    symbol: str,
+    session_date: str,
+    tz: str = "America/New_York",
+    price_in_nanos: bool = True,
+) -> pd.DataFrame:
+    raw = read_mbo_session(path, symbol=symbol, session_date=session_date, tz=tz)
+    return prepare_session(raw, symbol=symbol, session_date=session_date, tz=tz, price_in_nanos=price_in_nanos)
+
+# ---------- EBS wide block tables
+
+EBS_ORDER_FIELDS = ["DELETED_TIME", "NUM_PARTCP", "BUY_SELL_FLAG", "TICK_STATUS", "RECORD_TYPE", "PRICE", "SIZE", "OMDSEQ"]
+EBS_TRADE_FIELDS = ["PRICE", "SIZE", "BUY_SELL_FLAG"]
+EBS_NUMERIC_FIELDS = {"NUM_PARTCP", "BUY_SELL_FLAG", "TICK_STATUS", "RECORD_TYPE", "PRICE", "SIZE", "OMDSEQ"}
+_NS_PER_DAY = 86_400_000_000_000
+
+def read_header(path: str) -> List[str]:
+    with pa.input_stream(str(path), compression="detect") as f:
+        buf = b""
+        while b"\n" not in buf:
+            chunk = f.read(1 << 16)
+            if not chunk:
+                break
+            buf += chunk
+    line = buf.split(b"\n", 1)[0].decode().rstrip("\r")
+    return next(csv.reader([line]))
+
+def ebs_columns(header: Iterable[str], pairs: Iterable[str], fields: Iterable[str], prefixes: Iterable[str]) -> Dict[Tuple[str, str], str]:
+    """Map (pair, field) to the first matching block column present in the header."""
+    have = set(header)
+    out: Dict[Tuple[str, str], str] = {}
+    for p in pairs:
+        for f in fields:
+            for pref in prefixes:
+                c = f"{pref}{p}.{f}"
+                if c in have:
+                    out[(p, f)] = c
+                    break
+    return out
+
+def read_ebs_block(
+    path: str,
+    pairs: List[str],
+    fields: List[str],
+    prefixes: Iterable[str],
+    start: str = "09:30:00",
+    end: str = "16:00:00",
+) -> pd.DataFrame:
+    """Read only the requested pair blocks of a wide EBS table as one long frame."""
+    cols = ebs_columns(read_header(path), pairs, fields, prefixes)
+    types = {c: pa.float64() for (p, f), c in cols.items() if f in EBS_NUMERIC_FIELDS}
+    types.update({c: pa.string() for (p, f), c in cols.items() if f not in EBS_NUMERIC_FIELDS})
+    types["Time"] = pa.string()
+    table = pacsv.read_csv(
+        pa.input_stream(str(path), compression="detect"),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=["Time"] + list(dict.fromkeys(cols.values())), column_types=types, strings_can_be_null=True,
+        ),
+    )
+
+    ts = pd.to_datetime(table.column("Time").to_pandas(), errors="coerce").to_numpy(dtype="datetime64[ns]")
+    ns = ts.view(np.int64)
+    tod = ns % _NS_PER_DAY
+    lo = pd.Timedelta(start).value
+    hi = pd.Timedelta(end).value
+    keep = ~np.isnat(ts) & (tod >= lo) & (tod <= hi)
+    rows = np.flatnonzero(keep)
+    table = table.take(pa.array(rows))
+
+    n = len(rows)
+    found = [p for p in pairs if any((p, f) in cols for f in fields)]
+    long: Dict[str, object] = {
+        "timestamp": np.tile(ts[rows], len(found)),
+        "pair": pd.Categorical(np.repeat(found, n), categories=found),
+    }
+    for f in fields:
+        parts = []
+        for p in found:
+            c = cols.get((p, f))
+            if c is None:
+                parts.append(np.full(n, np.nan))
+            elif f in EBS_NUMERIC_FIELDS:
+                parts.append(table.column(c).to_numpy(zero_copy_only=False))
+            else:
+                parts.append(table.column(c).to_pandas().to_numpy(dtype=object))
+        if parts:
+            long[f] = np.concatenate(parts)
+    out = pd.DataFrame(long)
+    present = [f for f in fields if f in out]
+    return out.dropna(subset=present, how="all").reset_index(drop=True)
+
+def read_ebs_tables(
+    order_csv: str,
+    trade_csv: str,
+    pairs: List[str],
+    start: str = "09:30:00",
+    end: str = "16:00:00",
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Order and trade blocks for the given pairs, read concurrently."""
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        orders = pool.submit(read_ebs_block, order_csv, pairs, EBS_ORDER_FIELDS, ("EBS_BOOK::",), start, end)
+        trades = pool.submit(read_ebs_block, trade_csv, pairs, EBS_TRADE_FIELDS, ("EBS_TRADE::", "EBS_BOOK::"), start, end)
+        return orders.result(), trades.result()
@@ -1,12 +1,21 @@
 from __future__ import annotations
 import math
-from typing import Dict, Iterable, Optional, Tuple
+from typing import Dict, Iterable, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
+from .bars import COUNT_COLUMNS, OHLC_COLUMNS, build_bars, dense_time_bars
+from .book import L2Snapshots, TopOfBookTape, build_l2_snapshots, from_ticks
+
 # ---------- generic utilities
 
+def session_bounds(session_date: str, tz: str = "America/New_York") -> Tuple[pd.Timestamp, pd.Timestamp]:
+    d = pd.to_datetime(session_date).date()
+    sod = pd.Timestamp(d, tz=tz) + pd.Timedelta(hours=9, minutes=30)
+    eod = pd.Timestamp(d, tz=tz) + pd.Timedelta(hours=16)
+    return sod.as_unit("ns"), eod.as_unit("ns")
+
 def prepare_session(
     mbo: pd.DataFrame,
     symbol: str,
@@ -14,15 +23,15 @@ def prepare_session(
     tz: str = "America/New_York",
     price_in_nanos: bool = True,
 ) -> pd.DataFrame:
-    df = mbo[mbo["symbol"] == symbol].copy()
+    sod, eod = session_bounds(session_date, tz)
+
+    # filter on the raw integer timestamps first so only session rows get converted
+    t = mbo["ts_event"].to_numpy()
+    keep = (mbo["symbol"] == symbol).to_numpy() & (t >= sod.value) & (t < eod.value)
+    df = mbo.loc[keep].sort_values(["ts_event", "sequence"])
     df["ts"] = pd.to_datetime(df["ts_event"], unit="ns", utc=True)
     df["ts_et"] = df["ts"].dt.tz_convert(tz)
 
-    d = pd.to_datetime(session_date).date()
-    sod = pd.Timestamp(d, tz=tz) + pd.Timedelta(hours=9, minutes=30)
-    eod = pd.Timestamp(d, tz=tz) + pd.Timedelta(hours=16)
-
-    df = df[(df["ts_et"] >= sod) & (df["ts_et"] < eod)].sort_values(["ts_et", "sequence"])
     if price_in_nanos:
         df["px"] = df["price"] / 1_000_000_000.0
     else:
@@ -31,126 +40,108 @@ def prepare_session(
     df["second"] = df["ts_et"].dt.floor("s")
     return df
 
-def per_minute_dollar_volume(trades: pd.DataFrame) -> pd.Series:
-    return (
-        trades.assign(dollar=lambda t: t["px"] * t["size"])
-        .groupby("minute")["dollar"]
-        .sum()
-        .rename("dollar_volume")
-    )
-
-def order_counts_per_minute(mbo: pd.DataFrame) -> pd.DataFrame:
-    g = lambda d, n: d.groupby("minute").size().rename(n)
-    n_trades = g(mbo[mbo["action"] == "T"], "n_trades")
-    n_add = g(mbo[mbo["action"] == "A"], "n_orders_add")
-    n_new = g(mbo[mbo["action"].isin(["A", "F", "R"])], "n_orders_new")
-    n_cancel = g(mbo[mbo["action"] == "C"], "n_orders_cancel")
-    n_replace = g(mbo[mbo["action"] == "R"], "n_orders_replace")
-    return pd.concat([n_trades, n_new, n_add, n_cancel, n_replace], axis=1).fillna(0)
-
-def ohlc_per_minute(trades: pd.DataFrame) -> pd.DataFrame:
-    return trades.set_index("ts")["px"].resample("min").ohlc()
-
-def vwap_per_minute(trades: pd.DataFrame) -> pd.Series:
-    g = (
-        trades.assign(px_sz=lambda d: d["px"] * d["size"])
-        .groupby(pd.Grouper(key="ts", freq="min"))[["px_sz", "size"]]
-        .sum()
-    )
-    return (g["px_sz"] / g["size"]).rename("vwap")
+def _minute_bars(frame: pd.DataFrame, bars: Optional[pd.DataFrame]) -> pd.DataFrame:
+    return build_bars(frame, "time", "1min") if bars is None else bars
 
-# ---------- book rebuild and snapshots
+def per_minute_dollar_volume(trades: pd.DataFrame, bars: Optional[pd.DataFrame] = None) -> pd.Series:
+    b = _minute_bars(trades, bars)
+    return b.loc[b["n_trades"] > 0, "dollar_volume"].rename_axis("minute")
 
-def _best(levels: Dict[float, int], is_bid: bool) -> Tuple[Optional[float], int]:
-    keys = [p for p, q in levels.items() if q > 0]
-    if not keys:
-        return None, 0
-    p = max(keys) if is_bid else min(keys)
-    return p, int(levels[p])
+def order_counts_per_minute(mbo: pd.DataFrame, bars: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    b = _minute_bars(mbo, bars)[COUNT_COLUMNS]
+    return b[b.to_numpy().any(axis=1)].rename_axis("minute")
+
+def _utc_minutes(b: pd.DataFrame) -> pd.DataFrame:
+    b = dense_time_bars(b[b["n_trades"] > 0], "1min")
+    return b.set_axis(b.index.tz_convert("UTC"), axis=0).rename_axis("ts")
+
+def ohlc_per_minute(trades: pd.DataFrame, bars: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    return _utc_minutes(_minute_bars(trades, bars))[OHLC_COLUMNS]
+
+def vwap_per_minute(trades: pd.DataFrame, bars: Optional[pd.DataFrame] = None) -> pd.Series:
+    return _utc_minutes(_minute_bars(trades, bars))["vwap"]
+
+# ---------- book rebuild and snapshots
 
 def build_l2_by_bucket(mbo: pd.DataFrame, bucket: str = "minute") -> pd.DataFrame:
     assert bucket in {"minute", "second"}
-    orders: Dict[int, Tuple[str, float, int]] = {}
-    levels_bid: Dict[float, int] = {}
-    levels_ask: Dict[float, int] = {}
-    recs = []
-
-    current = mbo[bucket].iloc[0]
-
-    for r in mbo.itertuples(index=False):
-        act, oid, side, px, sz = r.action, int(r.order_id), r.side, float(r.px), int(r.size)
-
-        if getattr(r, bucket) > current:
-            bb, bq = _best(levels_bid, True)
-            ba, aq = _best(levels_ask, False)
-            spread = float(np.subtract(ba, bb)) if bb is not None and ba is not None else np.nan
-            if np.isfinite(spread):
-                for p, q in levels_ask.items():
-                    if q > 0:
-                        recs.append((getattr(r, bucket), "A", p, q, bb, ba, bq, aq, spread))
-                for p, q in levels_bid.items():
-                    if q > 0:
-                        recs.append((getattr(r, bucket), "B", p, q, bb, ba, bq, aq, spread))
-            current = getattr(r, bucket)
-
-        if act in ("A", "F"):
-            if oid in orders:
-                s_old, p_old, q_old = orders.pop(oid)
-                if s_old == "B":
-                    levels_bid[p_old] = levels_bid.get(p_old, 0) - q_old
-                else:
-                    levels_ask[p_old] = levels_ask.get(p_old, 0) - q_old
-            orders[oid] = (side, px, sz)
-            if side == "B":
-                levels_bid[px] = levels_bid.get(px, 0) + sz
-            else:
-                levels_ask[px] = levels_ask.get(px, 0) + sz
-
-        elif act == "C":
-            if oid in orders:
-                s_old, p_old, q_old = orders[oid]
-                dq = int(min(sz, q_old))
-                q_new = q_old - dq
-                if s_old == "B":
-                    levels_bid[p_old] = levels_bid.get(p_old, 0) - dq
-                else:
-                    levels_ask[p_old] = levels_ask.get(p_old, 0) - dq
-                if q_new > 0:
-                    orders[oid] = (s_old, p_old, q_new)
-                else:
-                    orders.pop(oid, None)
-
-        elif act == "R":
-            if oid in orders:
-                s_old, p_old, q_old = orders[oid]
-                if s_old == "B":
-                    levels_bid[p_old] = levels_bid.get(p_old, 0) - q_old
-                else:
-                    levels_ask[p_old] = levels_ask.get(p_old, 0) - q_old
-                orders[oid] = (side, px, sz)
-                if side == "B":
-                    levels_bid[px] = levels_bid.get(px, 0) + sz
-                else:
-                    levels_ask[px] = levels_ask.get(px, 0) + sz
-
-    l2 = pd.DataFrame(
-        recs,
-        columns=[
-            "ts", "side", "price", "depth",
-            "best_bid", "best_ask", "best_bid_depth", "best_ask_depth", "spread",
-        ],
-    )
-    l2["mid_price"] = (l2["best_bid"] + l2["best_ask"]) * 0.5
-    l2["rel_spread"] = l2["spread"] / l2["mid_price"]
-    return l2.set_index("ts").sort_index()
-
-def depth_near_touch(l2: pd.DataFrame, multiple: float = 2.0) -> pd.DataFrame:
-    avg_spread = l2["spread"].mean()
-    near = l2[
-        ((l2["side"] == "A") & (l2["price"] < l2["mid_price"] + multiple * avg_spread))
-        | ((l2["side"] == "B") & (l2["price"] > l2["mid_price"] - multiple * avg_spread))
-    ]
-    depth = near.groupby(["ts", "side"], observed=True)["depth"].sum()
+    return build_l2_snapshots(mbo, [bucket])[bucket].to_frame()
+
+DEPTH_UNITS = ("spread", "ticks", "bps")
+
+def _spread_reference(spread_px: pd.Series, spread: Union[str, float], window: Union[int, str]) -> np.ndarray:
+    if not isinstance(spread, str):
+        return np.full(len(spread_px), float(spread))
+    if spread == "session":
+        return np.full(len(spread_px), spread_px.mean())
+    if spread == "bucket":
+        return spread_px.to_numpy()
+    if spread == "rolling":
+        return spread_px.rolling(window, min_periods=1).mean().to_numpy()
+    raise ValueError(f"spread must be 'session', 'bucket', 'rolling' or a price, got {spread!r}")
+
+def depth_profile(
+    snaps: L2Snapshots,
+    bands: Iterable[float] = (0.5, 1, 2, 5, 10),
+    unit: str = "spread",
+    spread: Union[str, float] = "session",
+    window: Union[int, str] = 60,
+    tick_size: Optional[float] = None,
+) -> pd.DataFrame:
+    """Resting depth within each band of the mid, in spreads, ticks or bps, per bucket and side."""
+    bands = np.asarray(list(bands), dtype=float)
+    n, k = len(snaps), len(bands)
+    bid, ask = snaps.tob[:, 0], snaps.tob[:, 1]
+    if unit == "spread":
+        spread_px = pd.Series(from_ticks(ask - bid, snaps.price_scale), index=pd.Index(snaps.ts))
+        width = _spread_reference(spread_px, spread, window)[:, None] * bands[None, :]
+    elif unit == "ticks":
+        if tick_size is None:
+            raise ValueError("unit='ticks' needs tick_size")
+        width = np.broadcast_to(bands * tick_size, (n, k))
+    elif unit == "bps":
+        width = from_ticks(bid + ask, snaps.price_scale)[:, None] * 0.5e-4 * bands[None, :]
+    else:
+        raise ValueError(f"unit must be one of {DEPTH_UNITS}, got {unit!r}")
+
+    # distances in half ticks keep a mid between two ticks integral, so "< width" becomes "< ceil(width)";
+    # rounding first keeps float noise in a width of exactly k half ticks from admitting level k
+    lim = np.clip(np.ceil(np.round(width * 2 * snaps.price_scale, 6)), 0, None).astype(np.int64)
+    cap = int(lim.max()) + 1 if lim.size else 1
+    mid2 = bid + ask
+    rows = np.arange(n)
+    out = np.zeros((n, 2, k), dtype=np.int64)
+    for j, (start, count, ticks, depth, sign) in enumerate((
+        (snaps.ask_start, snaps.ask_count, snaps.ask_ticks, snaps.ask_depth, 1),
+        (snaps.bid_start, snaps.bid_count, snaps.bid_ticks, snaps.bid_depth, -1),
+    )):
+        first = np.cumsum(count) - count
+        owner = np.repeat(rows, count)
+        idx = np.repeat(start, count) + np.arange(owner.size) - np.repeat(first, count)
+        dist = np.clip(sign * (2 * ticks[idx] - mid2[owner]), 0, cap - 1)
+        cum = np.concatenate([[0], np.cumsum(depth[idx])])
+        pos = np.searchsorted(owner * cap + dist, rows[:, None] * cap + lim, side="left")
+        out[:, j, :] = cum[pos] - cum[first][:, None]
+    return pd.DataFrame({
+        "ts": snaps.ts[np.repeat(rows, 2 * k)],
+        "side": np.tile(np.repeat(["A", "B"], k), n),
+        "band": np.tile(bands, 2 * n),
+        "depth": out.ravel(),
+    })
+
+def depth_near_touch(l2: Union[pd.DataFrame, L2Snapshots], multiple: float = 2.0) -> pd.DataFrame:
+    """Depth within multiple average spreads of the mid per bucket and side, on a full minute grid."""
+    if isinstance(l2, L2Snapshots):
+        spread_px = from_ticks(l2.tob[:, 1] - l2.tob[:, 0], l2.price_scale)
+        avg_spread = np.average(spread_px, weights=l2.ask_count + l2.bid_count)
+        depth = depth_profile(l2, [multiple], spread=avg_spread).set_index(["ts", "side"])["depth"]
+    else:
+        avg_spread = l2["spread"].mean()
+        near = l2[
+            ((l2["side"] == "A") & (l2["price"] < l2["mid_price"] + multiple * avg_spread))
+            | ((l2["side"] == "B") & (l2["price"] > l2["mid_price"] - multiple * avg_spread))
+        ]
+        depth = near.groupby(["ts", "side"], observed=True)["depth"].sum()
     ts_idx = depth.index.get_level_values(0)
     tz = getattr(ts_idx[0], "tz", None)
     all_ts = pd.date_range(ts_idx.min().floor("min"), ts_idx.max().ceil("min"), freq="min", tz=tz)
@@ -159,38 +150,85 @@ def depth_near_touch(l2: pd.DataFrame, multiple: float = 2.0) -> pd.DataFrame:
 
 # ---------- impact and simple stats
 
+def _ns(s: pd.Series) -> np.ndarray:
+    return s.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+def _mid_tape(l2: pd.DataFrame) -> pd.Series:
+    return l2["mid_price"].groupby(level="ts").last().sort_index()
+
+def _asof(ts: np.ndarray, values: np.ndarray, at: np.ndarray) -> np.ndarray:
+    """Last value with ts <= at, NaN before the first observation; at may be any shape."""
+    i = np.searchsorted(ts, at, side="right") - 1
+    return np.where(i >= 0, values[np.maximum(i, 0)], np.nan)
+
+def grouped_ols(groups: np.ndarray, x: np.ndarray, y: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Intercept, slope and count of y on x within each group, NaN where x does not vary."""
+    n = np.bincount(groups, minlength=n_groups).astype(float)
+    sx = np.bincount(groups, weights=x, minlength=n_groups)
+    sy = np.bincount(groups, weights=y, minlength=n_groups)
+    sxx = np.bincount(groups, weights=x * x, minlength=n_groups)
+    sxy = np.bincount(groups, weights=x * y, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dxx = n * sxx - sx * sx
+        ok = (n >= 2) & (dxx > 0)
+        beta = np.where(ok, (n * sxy - sx * sy) / dxx, np.nan)
+        alpha = np.where(ok, (sy - beta * sx) / n, np.nan)
+    return alpha, beta, n
+
+def _impact_regressions(t: np.ndarray, sign: np.ndarray, mid0: np.ndarray, mid_h: np.ndarray, horizons: np.ndarray, tz) -> pd.DataFrame:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        log_r = np.log(mid_h / mid0[:, None])
+
+    minute_ns = t - t % 60_000_000_000
+    minutes, g = np.unique(minute_ns, return_inverse=True)
+    n_min, n_h = minutes.size, horizons.size
+    ok = np.isfinite(log_r)
+    gid = (g[:, None] * n_h + np.arange(n_h)[None, :])[ok]
+    x = np.broadcast_to(sign[:, None], log_r.shape)[ok]
+    alpha, beta, n = grouped_ols(gid, x, log_r[ok], n_min * n_h)
+
+    out = pd.DataFrame({
+        "minute": pd.DatetimeIndex(np.repeat(minutes, n_h).astype("datetime64[ns]")).tz_localize("UTC").tz_convert(tz),
+        "horizon": np.tile(horizons, n_min),
+        "alpha": alpha,
+        "beta": beta,
+        "n": n.astype(np.int64),
+    })
+    return out[out["n"] > 0].reset_index(drop=True)
+
+def _horizons_ns(horizons: np.ndarray) -> np.ndarray:
+    return np.rint(horizons * 1e9).astype(np.int64)
+
+def price_impact_curve(trades: pd.DataFrame, l2_sec: pd.DataFrame, horizons: Iterable[float] = range(1, 61)) -> pd.DataFrame:
+    """Per minute impact regressions of h second log mid changes on trade sign, for every horizon."""
+    horizons = np.asarray(list(horizons), dtype=float)
+    mids = _mid_tape(l2_sec)
+    mid_ts = _ns(mids.index.to_series())
+    mid_px = mids.to_numpy(dtype=float)
+
+    tr = trades.loc[trades["side"].isin(["A", "B"]), ["ts", "side"]]
+    t = _ns(tr["ts"])
+    order = np.argsort(t, kind="stable")
+    t = t[order]
+    sign = np.where(tr["side"].to_numpy()[order] == "B", 1.0, -1.0)
+
+    mid0 = _asof(mid_ts, mid_px, t)
+    mid_h = _asof(mid_ts, mid_px, t[:, None] + _horizons_ns(horizons)[None, :])
+    return _impact_regressions(t, sign, mid0, mid_h, horizons, mids.index.tz)
+
+def price_impact_event_time(mbo: pd.DataFrame, tape: TopOfBookTape, horizons: Iterable[float] = (5,)) -> pd.DataFrame:
+    """Impact regressions on the tape mid just before each trade and as of t + h."""
+    horizons = np.asarray(list(horizons), dtype=float)
+    pos = np.flatnonzero(((mbo["action"] == "T") & mbo["side"].isin(["A", "B"])).to_numpy())
+    t = tape.event_ts[pos]
+    sign = np.where(mbo["side"].to_numpy()[pos] == "B", 1.0, -1.0)
+    mid0 = tape.mid_before(pos)
+    mid_h = tape.mid_at(t[:, None] + _horizons_ns(horizons)[None, :])
+    return _impact_regressions(t, sign, mid0, mid_h, horizons, mbo["ts_et"].dt.tz)
+
 def price_impact_by_minute(trades: pd.DataFrame, l2_sec: pd.DataFrame, horizon_seconds: int = 5) -> pd.DataFrame:
-    tr = trades.loc[trades["side"].isin(["A", "B"]), ["ts", "side"]].copy()
-    tr = tr.sort_values("ts").assign(sign=lambda x: x["side"].map({"B": 1, "A": -1}).astype(int))
-
-    mids = (
-        l2_sec[["mid_price"]]
-        .reset_index()
-        .drop_duplicates("ts", keep="last")
-        .sort_values("ts")
-    )
-    tr = (
-        pd.merge_asof(tr, mids, on="ts", direction="backward")
-        .rename(columns={"mid_price": "mid0"})
-    )
-    tr["ts_h"] = tr["ts"] + pd.Timedelta(seconds=horizon_seconds)
-    mids_h = mids.rename(columns={"ts": "ts_h", "mid_price": "mid_h"})
-    tr = pd.merge_asof(tr.sort_values("ts_h"), mids_h, on="ts_h", direction="backward").dropna(subset=["mid0", "mid_h"])
-
-    tr["log_r"] = np.log(tr["mid_h"] / tr["mid0"])
-    tr["minute"] = tr["ts"].dt.floor("min")
-
-    def _ols(g: pd.DataFrame) -> pd.Series:
-        x = g["sign"].astype(float).to_numpy()
-        y = g["log_r"].astype(float).to_numpy()
-        if x.size < 2 or np.var(x) == 0.0:
-            return pd.Series({"alpha": np.nan, "beta": np.nan, "n": x.size})
-        X = np.column_stack([np.ones_like(x), x])
-        alpha, beta = np.linalg.lstsq(X, y, rcond=None)[0]
-        return pd.Series({"alpha": alpha, "beta": beta, "n": x.size})
-
-    out = tr.groupby("minute", observed=True).apply(_ols).reset_index()
-    return out.rename(columns={"beta": f"beta_{horizon_seconds}s"})
+    out = price_impact_curve(trades, l2_sec, [horizon_seconds])
+    return out[["minute", "alpha", "beta", "n"]].rename(columns={"beta": f"beta_{horizon_seconds}s"})
 
 def build_mid_and_px_series(l2: pd.DataFrame, trades: pd.DataFrame) -> Dict[str, pd.Series]:
     mid_1s = l2[["mid_price"]].groupby("ts").last()["mid_price"]
@@ -209,12 +247,45 @@ def realized_variance(returns: pd.Series) -> float:
     r = returns.dropna().astype(float)
     return float((r * r).sum())
 
+def lagged_sums(a: np.ndarray, b: np.ndarray, max_lag: int, negative: bool = False) -> np.ndarray:
+    """sum_t a_t+h b_t for h = 0..max_lag, or -max_lag..max_lag with negative, per column."""
+    n = a.shape[0]
+    if max_lag <= 16:
+        pos = [(a[h:] * b[: max(n - h, 0)]).sum(axis=0) for h in range(max_lag + 1)]
+        neg = [(a[: max(n - h, 0)] * b[h:]).sum(axis=0) for h in range(max_lag, 0, -1)] if negative else []
+        return np.stack(neg + pos)
+    nfft = 1 << int(n + max_lag - 1).bit_length()
+    fa = np.fft.rfft(np.ascontiguousarray(a.T), n=nfft, axis=-1)
+    fb = fa if b is a else np.fft.rfft(np.ascontiguousarray(b.T), n=nfft, axis=-1)
+    full = np.fft.irfft(fa * np.conj(fb), n=nfft, axis=-1).T
+    return np.concatenate([full[nfft - max_lag:], full[: max_lag + 1]]) if negative else full[: max_lag + 1]
+
+def _centred(x) -> Tuple[np.ndarray, bool]:
+    a = np.asarray(x, dtype=float)
+    one = a.ndim == 1
+    a = a[:, None] if one else a
+    valid = np.isfinite(a)
+    mean = np.where(valid, a, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+    return np.where(valid, a - mean, 0.0), one
+
+def acf_fft(x, nlags: int = 10) -> np.ndarray:
+    """Autocorrelations at lags 1..nlags per column, treating NaNs as gaps that keep their place in time."""
+    z, one = _centred(x)
+    s = lagged_sums(z, z, nlags)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where(s[0] > 0, s[1:] / s[0], np.nan)
+    return out[:, 0] if one else out
+
+def ccf_fft(x, y, nlags: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+    """Cross correlations corr(x_t, y_t+k) for k = -nlags..nlags per column; positive k means x leads y."""
+    zx, one = _centred(x)
+    zy, _ = _centred(y)
+    s = lagged_sums(zy, zx, nlags, negative=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        norm = np.sqrt((zx * zx).sum(axis=0) * (zy * zy).sum(axis=0))
+        out = s / np.where(norm > 0, norm, np.nan)
+    return np.arange(-nlags, nlags + 1), out[:, 0] if one else out
+
 def acf_np(x: Iterable[float], nlags: int = 10) -> np.ndarray:
-    x = np.asarray(list(pd.Series(x).dropna()), dtype=float)
-    x = x - np.nanmean(x)
-    denom = np.nansum(x * x)
-    out = []
-    for k in range(1, nlags + 1):
-        num = np.nansum(x[k:] * x[:-k])
-        out.append(num / denom if denom > 0 else np.nan)
-    return np.array(out)
+    x = pd.Series(x).dropna().to_numpy(dtype=float)
+    return acf_fft(x, nlags)
@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -16,7 +17,7 @@ def _style(ax, title: str, ylabel: str):
     ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(loc))
     return ax
 
-def line_series(s: pd.Series, title: str, ylabel: str, savepath: Optional[str] = None):
+def line_series(s: pd.Series, title: str, ylabel: str, savepath: Optional[str] = None, dpi: int = 300):
     s = s.copy()
     s.index = pd.to_datetime(s.index)
     fig, ax = plt.subplots(figsize=(12, 4))
@@ -24,10 +25,28 @@ def line_series(s: pd.Series, title: str, ylabel: str, savepath: Optional[str] =
     _style(ax, title, ylabel)
     fig.tight_layout()
     if savepath:
-        fig.savefig(savepath, dpi=300)
+        fig.savefig(savepath, dpi=dpi)
     plt.close(fig)
 
-def bar_minute(s: pd.Series, title: str, ylabel: str, savepath: Optional[str] = None):
+def signature_plot(sig: pd.DataFrame, title: str, savepath: Optional[str] = None, dpi: int = 300):
+    fig, ax = plt.subplots(figsize=(8, 4))
+    for c in sig.columns:
+        ax.plot(sig.index, sig[c].values, marker="o", ms=3, label=str(c))
+    ax.set_xscale("log")
+    ax.set_xlabel("sampling interval, seconds")
+    ax.set_title(title, loc="left")
+    ax.set_ylabel("realized variance")
+    ax.grid(True, alpha=0.25)
+    for s in ["top", "right"]:
+        ax.spines[s].set_visible(False)
+    if len(sig.columns) > 1:
+        ax.legend(frameon=False, fontsize=8)
+    fig.tight_layout()
+    if savepath:
+        fig.savefig(savepath, dpi=dpi)
+    plt.close(fig)
+
+def bar_minute(s: pd.Series, title: str, ylabel: str, savepath: Optional[str] = None, dpi: int = 300):
     s = s.copy()
     s.index = pd.to_datetime(s.index)
     fig, ax = plt.subplots(figsize=(12, 4))
@@ -36,5 +55,96 @@ def bar_minute(s: pd.Series, title: str, ylabel: str, savepath: Optional[str] =
     _style(ax, title, ylabel)
     fig.tight_layout()
     if savepath:
-        fig.savefig(savepath, dpi=300)
+        fig.savefig(savepath, dpi=dpi)
     plt.close(fig)
+
+# ---------- downsampling
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, n_bins: int) -> np.ndarray:
+    """Positions of the first, last, min and max point in each of n_bins equal x bins, in x order."""
+    n = len(y)
+    if n <= 4 * n_bins:
+        return np.arange(n)
+    x = x.astype(float)
+    span = x[-1] - x[0]
+    b = np.minimum(((x - x[0]) / span * n_bins).astype(np.int64), n_bins - 1) if span > 0 else np.zeros(n, np.int64)
+    order = np.lexsort((y, b))
+    hi = np.r_[np.flatnonzero(np.diff(b[order])), n - 1]
+    lo = np.r_[0, hi[:-1] + 1]
+    edges = np.flatnonzero(np.diff(b)) + 1
+    keep = np.concatenate([order[lo], order[hi], [0, n - 1], edges, edges - 1])
+    return np.unique(keep)
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest triangle three buckets: n_out positions that keep the visual shape of y over x."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = x.astype(float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+def downsample(s: pd.Series, n_points: int, method: str = "minmax") -> pd.Series:
+    s = s.dropna()
+    if len(s) <= n_points:
+        return s
+    x = pd.to_datetime(s.index).asi8 if not pd.api.types.is_numeric_dtype(s.index) else s.index.to_numpy()
+    y = s.to_numpy(dtype=float)
+    idx = lttb_indices(x, y, n_points) if method == "lttb" else minmax_indices(x, y, max(n_points // 4, 1))
+    return s.iloc[idx]
+
+# ---------- queued rendering
+
+FIGURE_MODES = ("full", "fast", "none")
+_RENDERERS = {"line": line_series, "bar": bar_minute, "signature": signature_plot}
+
+def _render(job: Tuple) -> None:
+    kind, args, dpi = job
+    _RENDERERS[kind](*args, dpi=dpi)
+
+class FigureSet:
+    """Figures queued by a pipeline and drawn together by render()."""
+
+    def __init__(self, mode: str = "full", workers: int = 1, max_points: int = 2000, method: str = "minmax", fast_dpi: int = 150):
+        if mode not in FIGURE_MODES:
+            raise ValueError(f"figures must be one of {FIGURE_MODES}, got {mode!r}")
+        self.mode = mode
+        self.workers = workers
+        self.max_points = max_points
+        self.method = method
+        self.dpi = 300 if mode == "full" else fast_dpi
+        self.jobs: List[Tuple] = []
+
+    def line(self, s: pd.Series, title: str, ylabel: str, savepath) -> None:
+        if self.mode == "none":
+            return
+        if self.mode == "fast":
+            s = downsample(s, self.max_points, self.method)
+        self.jobs.append(("line", (s, title, ylabel, str(savepath)), self.dpi))
+
+    def bar(self, s: pd.Series, title: str, ylabel: str, savepath) -> None:
+        if self.mode != "none":
+            self.jobs.append(("bar", (s, title, ylabel, str(savepath)), self.dpi))
+
+    def signature(self, sig: pd.DataFrame, title: str, savepath) -> None:
+        if self.mode != "none":
+            self.jobs.append(("signature", (sig, title, str(savepath)), self.dpi))
+
+    def render(self) -> None:
+        jobs, self.jobs = self.jobs, []
+        if self.workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs))) as pool:
+                list(pool.map(_render, jobs))
+        else:
+            for job in jobs:
+                _render(job)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+import contextlib
+import json
+import os
+import pathlib
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+def rss_mb() -> Optional[float]:
+    """Current resident set size of this process, Linux only."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        return None
+
+def peak_rss_mb() -> Optional[float]:
+    """Highest resident set size this process has reached so far."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+class RunProfile:
+    """Wall time, CPU time, memory and row counts per pipeline stage."""
+
+    def __init__(self, name: str, trace_memory: bool = False, profiler: Optional[str] = None, **params):
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError(f"profiler must be one of {PROFILERS}, got {profiler!r}")
+        self.name = name
+        self.params = params
+        self.trace_memory = trace_memory
+        self.profiler = profiler
+        self.stages: List[Dict[str, object]] = []
+        self._sampler = None
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+        self.started_at = pd.Timestamp.now(tz="UTC").isoformat()
+        self._own_trace = trace_memory and not tracemalloc.is_tracing()
+        if self._own_trace:
+            tracemalloc.start()
+        if profiler == "cprofile":
+            import cProfile
+            self._sampler = cProfile.Profile()
+            self._sampler.enable()
+        elif profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError as e:
+                raise ImportError("profiler='pyinstrument' needs the pyinstrument package") from e
+            self._sampler = Profiler()
+            self._sampler.start()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **counts) -> Iterator[Dict[str, object]]:
+        rec: Dict[str, object] = {"stage": name, **counts}
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        rss0, peak0 = rss_mb(), peak_rss_mb()
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield rec
+        finally:
+            wall = time.perf_counter() - t0
+            rec["wall_sec"] = wall
+            rec["cpu_sec"] = time.process_time() - c0
+            rss1 = rss_mb()
+            rec["rss_mb"] = rss1
+            rec["rss_growth_mb"] = rss1 - rss0 if rss0 is not None and rss1 is not None else None
+            # ru_maxrss is the high-water mark of the whole process, so the stage's own share is how far it raised it
+            peak1 = peak_rss_mb()
+            rec["process_peak_rss_mb"] = peak1
+            rec["peak_rss_growth_mb"] = peak1 - peak0 if peak0 is not None and peak1 is not None else None
+            if self.trace_memory:
+                rec["py_peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+            if rec.get("events"):
+                rec["events_per_sec"] = rec["events"] / wall if wall > 0 else None
+            self.stages.append(rec)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.stages)
+
+    def report(self) -> Dict[str, object]:
+        return {
+            "run": self.name,
+            "started_at": self.started_at,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": self.params,
+            "total_wall_sec": time.perf_counter() - self._t0,
+            "total_cpu_sec": time.process_time() - self._c0,
+            "process_peak_rss_mb": peak_rss_mb(),
+            "stages": self.stages,
+        }
+
+    def write(self, path) -> pathlib.Path:
+        """Stop the profiler if one runs and write the JSON report, plus the profiler output beside it."""
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if self.profiler == "cprofile" and self._sampler is not None:
+            self._sampler.disable()
+            self._sampler.dump_stats(str(path.with_suffix(".prof")))
+        elif self.profiler == "pyinstrument" and self._sampler is not None:
+            self._sampler.stop()
+            path.with_suffix(".html").write_text(self._sampler.output_html())
+        self._sampler = None
+        if self._own_trace:
+            tracemalloc.stop()
+            self._own_trace = False
+        path.write_text(json.dumps(self.report(), indent=2, default=str))
+        return path
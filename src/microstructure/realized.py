@@ -0,0 +1,131 @@
+from __future__ import annotations
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .metrics import lagged_sums
+
+SIGNATURE_SECONDS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1200, 1800)
+
+# Parzen kernel constant of Barndorff-Nielsen, Hansen, Lunde and Shephard (2009)
+PARZEN_C = 3.5134
+
+# ---------- inputs
+
+def log_price_panel(series: Union[Dict[str, pd.Series], pd.DataFrame], freq: str = "1s") -> pd.DataFrame:
+    """Log prices of many series on one regular grid, carried forward between observations."""
+    df = pd.DataFrame(series) if isinstance(series, dict) else series
+    df = df.resample(freq, label="left", closed="left").last().ffill()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.log(df.where(df > 0))
+
+def _values(logp) -> np.ndarray:
+    a = np.asarray(logp, dtype=float)
+    return a[:, None] if a.ndim == 1 else a
+
+def _diff(p: np.ndarray, k: int = 1) -> np.ndarray:
+    """All overlapping k step log returns per column, zero where either end is missing."""
+    if k >= p.shape[0]:
+        return np.zeros((0, p.shape[1]))
+    r = p[k:] - p[:-k]
+    r[~np.isfinite(r)] = 0.0
+    return r
+
+# ---------- estimators on (time, series) log price arrays
+
+def rv_sparse(logp, k: int = 1) -> np.ndarray:
+    """RV from every k-th grid point starting at the first."""
+    r = _diff(_values(logp)[::k])
+    return (r * r).sum(axis=0)
+
+def rv_subsampled(logp, k: int = 1) -> np.ndarray:
+    """RV at k steps averaged over all k starting offsets."""
+    r = _diff(_values(logp), k)
+    return (r * r).sum(axis=0) / k
+
+def two_scale_rv(logp, k: int = 300) -> np.ndarray:
+    """Two scale RV of Zhang, Mykland and Ait-Sahalia (2005) with the small sample adjustment."""
+    p = _values(logp)
+    n = p.shape[0] - 1
+    nbar = (n - k + 1) / k
+    rv_all = rv_subsampled(p, 1)
+    return (rv_subsampled(p, k) - nbar / n * rv_all) / (1.0 - nbar / n)
+
+def parzen(x: np.ndarray) -> np.ndarray:
+    x = np.abs(np.asarray(x, dtype=float))
+    return np.where(x <= 0.5, 1 - 6 * x**2 + 6 * x**3, np.where(x <= 1.0, 2 * (1 - x) ** 3, 0.0))
+
+def noise_variance(logp) -> np.ndarray:
+    """Bandi and Russell noise variance, RV at the finest step over 2n."""
+    p = _values(logp)
+    n = max(p.shape[0] - 1, 1)
+    return rv_subsampled(p, 1) / (2 * n)
+
+def kernel_bandwidth(logp, k_sparse: int = 1200) -> np.ndarray:
+    """Parzen bandwidth H = c* xi^(4/5) n^(3/5), with xi^2 = noise variance / sparse RV."""
+    p = _values(logp)
+    n = p.shape[0] - 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        xi2 = noise_variance(p) / rv_subsampled(p, min(k_sparse, max(n, 1)))
+    h = np.ceil(PARZEN_C * np.nan_to_num(xi2, nan=0.0, posinf=0.0) ** 0.4 * n**0.6)
+    return np.clip(h, 1, max(n - 1, 1)).astype(np.int64)
+
+def realized_kernel(logp, bandwidth: Optional[Union[int, np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Parzen realized kernel per column and the bandwidth used."""
+    p = _values(logp)
+    r = _diff(p)
+    H = kernel_bandwidth(p) if bandwidth is None else np.broadcast_to(np.asarray(bandwidth, dtype=np.int64), (p.shape[1],))
+    h_max = min(int(H.max(initial=0)), max(r.shape[0] - 1, 0))
+    gamma = lagged_sums(r, r, h_max) if r.shape[0] else np.zeros((1, p.shape[1]))
+    h = np.arange(1, h_max + 1)[:, None]
+    w = parzen((h - 1) / H[None, :])
+    return (r * r).sum(axis=0) + 2.0 * (w * gamma[1:]).sum(axis=0), H
+
+def bipower_variation(logp, k: int = 60) -> np.ndarray:
+    """Bipower variation (pi/2) n/(n-1) sum |r_t||r_t-1| from k step returns."""
+    r = np.abs(_diff(_values(logp)[::k]))
+    n = r.shape[0]
+    if n < 2:
+        return np.full(r.shape[1], np.nan)
+    return np.pi / 2 * n / (n - 1) * (r[1:] * r[:-1]).sum(axis=0)
+
+# ---------- suite
+
+def rv_signature(logp: pd.DataFrame, intervals: Iterable[float] = SIGNATURE_SECONDS, base_seconds: float = 1.0) -> pd.DataFrame:
+    """Subsampled RV per sampling interval (rows, seconds) for every column."""
+    p = _values(logp)
+    rows = {}
+    for sec in intervals:
+        k = int(round(sec / base_seconds))
+        if 1 <= k < p.shape[0]:
+            rows[sec] = rv_subsampled(p, k)
+    out = pd.DataFrame.from_dict(rows, orient="index", columns=logp.columns)
+    out.index.name = "interval_sec"
+    return out
+
+def realized_measures(
+    logp: pd.DataFrame,
+    base_seconds: float = 1.0,
+    intervals: Iterable[float] = SIGNATURE_SECONDS,
+    tsrv_seconds: float = 300,
+    bv_seconds: float = 60,
+    bandwidth: Optional[int] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Signature table and per series noise robust measures from one log price grid."""
+    p = _values(logp)
+    k_tsrv = max(int(round(tsrv_seconds / base_seconds)), 1)
+    k_bv = max(int(round(bv_seconds / base_seconds)), 1)
+    rk, H = realized_kernel(p, bandwidth)
+    summary = pd.DataFrame({
+        "n_obs": np.isfinite(p).sum(axis=0),
+        "rv_base": rv_subsampled(p, 1),
+        "rv_sparse": rv_sparse(p, k_tsrv),
+        "rv_subsampled": rv_subsampled(p, k_tsrv),
+        "tsrv": two_scale_rv(p, k_tsrv),
+        "realized_kernel": rk,
+        "kernel_bandwidth": H,
+        "bipower": bipower_variation(p, k_bv),
+        "noise_var": noise_variance(p),
+    }, index=pd.Index(logp.columns, name="series"))
+    return rv_signature(logp, intervals, base_seconds), summary
@@ -0,0 +1,172 @@
+from __future__ import annotations
+import datetime
+import os
+import pathlib
+import shutil
+import urllib.parse
+from typing import Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+_TS = pa.timestamp("ns", tz="UTC")
+_MINUTE = [("minute", _TS), ("minute_of_day", pa.int16())]
+
+# one schema per table; symbol and date live in the partition path, not the files
+METRIC_SCHEMAS: Dict[str, pa.Schema] = {
+    "bars": pa.schema(
+        _MINUTE
+        + [("ts_open", _TS), ("ts_close", _TS)]
+        + [(c, pa.int64()) for c in ("n_events", "n_trades", "n_orders_new", "n_orders_add", "n_orders_cancel", "n_orders_replace", "n_orders_fill")]
+        + [(c, pa.float64()) for c in ("volume", "dollar_volume", "open", "high", "low", "close", "vwap")]
+        + [("n_buy", pa.int64()), ("n_sell", pa.int64())]
+        + [(c, pa.float64()) for c in ("buy_volume", "sell_volume", "signed_volume")]
+    ),
+    "spread": pa.schema(_MINUTE + [("bid", pa.float64()), ("ask", pa.float64()), ("spread", pa.float64())]),
+    "depth": pa.schema(_MINUTE + [("side", pa.string()), ("multiple", pa.float64()), ("depth", pa.int64())]),
+    "impact": pa.schema(_MINUTE + [
+        ("clock", pa.string()), ("horizon_seconds", pa.float64()),
+        ("alpha", pa.float64()), ("beta", pa.float64()), ("n", pa.int64()),
+    ]),
+    "realized": pa.schema([
+        ("series", pa.string()), ("n_obs", pa.int64()), ("rv_base", pa.float64()), ("rv_sparse", pa.float64()),
+        ("rv_subsampled", pa.float64()), ("tsrv", pa.float64()), ("realized_kernel", pa.float64()),
+        ("kernel_bandwidth", pa.int64()), ("bipower", pa.float64()), ("noise_var", pa.float64()), ("rv_1m", pa.float64()),
+    ]),
+    "acf": pa.schema([("series", pa.string()), ("lag", pa.int16()), ("acf", pa.float64())]),
+}
+PARTITIONING = pa.schema([("symbol", pa.string()), ("date", pa.date32())])
+
+DateLike = Union[str, datetime.date, pd.Timestamp]
+
+def _date(d: DateLike) -> datetime.date:
+    return pd.Timestamp(d).date()
+
+def with_minute(df: pd.DataFrame, ts: Union[str, pd.Series, pd.Index], tz: Optional[str] = None) -> pd.DataFrame:
+    """Add the UTC minute and the local minute of day; naive timestamps are clock times in tz."""
+    t = pd.DatetimeIndex(df[ts] if isinstance(ts, str) else ts)
+    if t.tz is None:
+        t = t.tz_localize(tz or "UTC")
+    local = t.tz_convert(tz) if tz else t
+    out = df.copy()
+    out["minute"] = t.tz_convert("UTC").as_unit("ns")
+    out["minute_of_day"] = (local.hour * 60 + local.minute).astype("int16")
+    return out
+
+class MetricsStore:
+    """Partitioned Parquet store of per session metrics, one file per table, symbol and date."""
+
+    def __init__(self, root: str, compression: str = "zstd"):
+        self.root = pathlib.Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+
+    def _schema(self, table: str) -> pa.Schema:
+        if table not in METRIC_SCHEMAS:
+            raise KeyError(f"unknown metrics table {table!r}, expected one of {sorted(METRIC_SCHEMAS)}")
+        return METRIC_SCHEMAS[table]
+
+    def path(self, table: str, symbol: str, session_date: DateLike) -> pathlib.Path:
+        return self.root / table / f"symbol={urllib.parse.quote(str(symbol), safe='')}" / f"date={_date(session_date).isoformat()}"
+
+    def write(self, table: str, df: pd.DataFrame, symbol: str, session_date: DateLike) -> pathlib.Path:
+        """Replace one (symbol, date) partition of a table; columns missing from df are written as nulls."""
+        schema = self._schema(table)
+        df = df.reset_index(drop=True)
+        cols = {f.name: (df[f.name] if f.name in df else pd.Series([None] * len(df), dtype=object)) for f in schema}
+        tbl = pa.Table.from_pandas(pd.DataFrame(cols), schema=schema, preserve_index=False)
+        d = self.path(table, symbol, session_date)
+        d.mkdir(parents=True, exist_ok=True)
+        tmp = d / ".part-0.parquet.tmp"
+        pq.write_table(tbl, tmp, compression=self.compression)
+        os.replace(tmp, d / "part-0.parquet")
+        return d / "part-0.parquet"
+
+    def write_many(self, tables: Dict[str, pd.DataFrame], symbol: str, session_date: DateLike) -> List[pathlib.Path]:
+        return [self.write(t, df, symbol, session_date) for t, df in tables.items() if df is not None]
+
+    # ---------- reads
+
+    def dataset(self, table: str) -> Optional[ds.Dataset]:
+        schema = self._schema(table)
+        base = self.root / table
+        if not any(base.glob("symbol=*/date=*/*.parquet")):
+            return None
+        return ds.dataset(
+            base, format="parquet", partitioning=ds.partitioning(PARTITIONING, flavor="hive"),
+            schema=pa.unify_schemas([schema, PARTITIONING]), exclude_invalid_files=True,
+        )
+
+    @staticmethod
+    def predicate(
+        symbols: Optional[Iterable[str]] = None,
+        start: Optional[DateLike] = None,
+        end: Optional[DateLike] = None,
+        where: Optional[ds.Expression] = None,
+    ) -> Optional[ds.Expression]:
+        """Partition filters on symbol and the inclusive [start, end] date range, and'ed with where."""
+        parts = []
+        if symbols is not None:
+            parts.append(ds.field("symbol").isin(list(symbols)))
+        if start is not None:
+            parts.append(ds.field("date") >= pa.scalar(_date(start), pa.date32()))
+        if end is not None:
+            parts.append(ds.field("date") <= pa.scalar(_date(end), pa.date32()))
+        if where is not None:
+            parts.append(where)
+        if not parts:
+            return None
+        out = parts[0]
+        for p in parts[1:]:
+            out = out & p
+        return out
+
+    def scan(
+        self,
+        table: str,
+        columns: Optional[List[str]] = None,
+        symbols: Optional[Iterable[str]] = None,
+        start: Optional[DateLike] = None,
+        end: Optional[DateLike] = None,
+        where: Optional[ds.Expression] = None,
+    ) -> pa.Table:
+        dset = self.dataset(table)
+        full = pa.unify_schemas([self._schema(table), PARTITIONING])
+        if dset is None:
+            return full.empty_table().select(columns) if columns else full.empty_table()
+        return dset.to_table(columns=columns, filter=self.predicate(symbols, start, end, where))
+
+    def read(self, table: str, **kw) -> pd.DataFrame:
+        return self.scan(table, **kw).to_pandas()
+
+    def query(
+        self,
+        table: str,
+        values: Union[str, List[str]],
+        by: Union[str, List[str]],
+        agg: Union[str, List[str]] = "median",
+        **kw,
+    ) -> pd.DataFrame:
+        """Aggregate values by keys over the matching partitions and rows."""
+        values = [values] if isinstance(values, str) else list(values)
+        by = [by] if isinstance(by, str) else list(by)
+        df = self.scan(table, columns=list(dict.fromkeys(by + values)), **kw).to_pandas()
+        return df.groupby(by, sort=True, observed=True)[values].agg(agg)
+
+    def partitions(self, table: str) -> pd.DataFrame:
+        rows = [
+            {"symbol": urllib.parse.unquote(p.parent.name.split("=", 1)[1]), "date": _date(p.name.split("=", 1)[1])}
+            for p in sorted((self.root / table).glob("symbol=*/date=*")) if any(p.glob("*.parquet"))
+        ]
+        return pd.DataFrame(rows, columns=["symbol", "date"])
+
+    def drop(self, symbol: Optional[str] = None, session_date: Optional[DateLike] = None) -> int:
+        sym = f"symbol={urllib.parse.quote(symbol, safe='')}" if symbol else "symbol=*"
+        day = f"date={_date(session_date).isoformat()}" if session_date else "date=*"
+        gone = list(self.root.glob(f"*/{sym}/{day}"))
+        for p in gone:
+            shutil.rmtree(p, ignore_errors=True)
+        return len(gone)
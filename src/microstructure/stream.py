@@ -0,0 +1,338 @@
+from __future__ import annotations
+import math
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .book import PRICE_SCALE, OrderBook
+
+SECOND_NS = 1_000_000_000
+MINUTE_NS = 60 * SECOND_NS
+_NAN = float("nan")
+
+# ---------- running series statistics
+
+class RunningACF:
+    """Realized variance and autocorrelations of a growing return series, O(nlags) per update."""
+
+    def __init__(self, nlags: int = 20):
+        self.nlags = nlags
+        self.n = 0
+        self.s1 = 0.0
+        self.s2 = 0.0
+        self.cross = [0.0] * nlags
+        self.head: List[float] = []
+        self.tail: Deque[float] = deque(maxlen=nlags)
+
+    def update(self, x: float) -> None:
+        cross = self.cross
+        for k, prev in enumerate(reversed(self.tail)):
+            cross[k] += x * prev
+        self.n += 1
+        self.s1 += x
+        self.s2 += x * x
+        if len(self.head) < self.nlags:
+            self.head.append(x)
+        self.tail.append(x)
+
+    @property
+    def rv(self) -> float:
+        return self.s2
+
+    def acf(self) -> np.ndarray:
+        n, s1 = self.n, self.s1
+        out = np.full(self.nlags, np.nan)
+        if n == 0:
+            return out
+        m = s1 / n
+        denom = self.s2 - n * m * m
+        if not denom > 0:
+            return out
+        tail = list(self.tail)
+        for k in range(1, self.nlags + 1):
+            if k >= n:
+                out[k - 1] = 0.0
+                continue
+            # sum over t >= k of (x_t - m)(x_{t-k} - m) from the raw sums
+            num = self.cross[k - 1] - m * (s1 - sum(self.head[:k])) - m * (s1 - sum(tail[-k:])) + (n - k) * m * m
+            out[k - 1] = num / denom
+        return out
+
+def _ols(s: List[float]) -> Tuple[float, float]:
+    n, sx, sy, sxx, sxy = s
+    dxx = n * sxx - sx * sx
+    if n < 2 or not dxx > 0:
+        return _NAN, _NAN
+    beta = (n * sxy - sx * sy) / dxx
+    return (sy - beta * sx) / n, beta
+
+class _Bar:
+    __slots__ = ("n_events", "counts", "volume", "dollar_volume", "open", "high", "low", "close",
+                 "n_buy", "n_sell", "buy_volume", "sell_volume")
+
+    def __init__(self):
+        self.n_events = 0
+        self.counts: Dict[str, int] = {"A": 0, "C": 0, "R": 0, "F": 0, "T": 0}
+        self.volume = self.dollar_volume = 0.0
+        self.open = self.high = self.low = self.close = _NAN
+        self.n_buy = self.n_sell = 0
+        self.buy_volume = self.sell_volume = 0.0
+
+# ---------- streaming session
+
+class StreamingSession:
+    """Online per minute metrics for one symbol, fed MBO events in time order."""
+
+    def __init__(
+        self,
+        tz: str = "America/New_York",
+        horizon_seconds: float = 5,
+        impact_window_minutes: int = 30,
+        near_touch_multiple: float = 2.0,
+        near_touch_spread: Optional[float] = None,
+        acf_lags: int = 20,
+        price_scale: int = PRICE_SCALE,
+        on_bucket: Optional[Callable[[dict], None]] = None,
+    ):
+        self.tz = tz
+        self.horizon_ns = int(round(horizon_seconds * 1e9))
+        self.horizon_seconds = horizon_seconds
+        self.window_ns = impact_window_minutes * MINUTE_NS
+        self.multiple = near_touch_multiple
+        self.near_touch_spread = near_touch_spread
+        self.price_scale = price_scale
+        self.on_bucket = on_bucket
+
+        self.book = OrderBook()
+        self.n_events = 0
+        self.records: List[dict] = []
+        self._sec: Optional[int] = None
+        self._min: Optional[int] = None
+        self._bar = _Bar()
+        self._open: dict = {}
+        self._spread_sum = 0.0
+        self._spread_rows = 0
+
+        self._sec_mid = _NAN
+        self._pending: Deque[Tuple[int, float, float, int]] = deque()
+        self._impact: Dict[int, List[float]] = {}
+        self._rolling: Deque[Tuple[int, List[float]]] = deque()
+        self._closed: Deque[dict] = deque()
+
+        self.mid_stats = RunningACF(acf_lags)
+        self.px_stats = RunningACF(acf_lags)
+        self._mid_min: Optional[int] = None
+        self._mid_last = _NAN
+        self._log_mid_prev = _NAN
+        self._log_px_prev = _NAN
+
+    # ----- event intake
+
+    def on_event(self, ts: int, action: str, side: str, px: float, size: int, order_id: int) -> None:
+        """Apply one event; ts is ns since the epoch in UTC and px is in dollars."""
+        sec = ts - ts % SECOND_NS
+        if sec != self._sec:
+            self._second_open(sec)
+        self.n_events += 1
+        b = self._bar
+        b.n_events += 1
+        if action in b.counts:
+            b.counts[action] += 1
+        if action == "T":
+            b.volume += size
+            b.dollar_volume += px * size
+            if b.open != b.open:
+                b.open = b.high = b.low = px
+            elif px > b.high:
+                b.high = px
+            elif px < b.low:
+                b.low = px
+            b.close = px
+            if side == "B":
+                b.n_buy += 1
+                b.buy_volume += size
+                self._pending.append((ts, 1.0, self._sec_mid, ts - ts % MINUTE_NS))
+            elif side == "A":
+                b.n_sell += 1
+                b.sell_volume += size
+                self._pending.append((ts, -1.0, self._sec_mid, ts - ts % MINUTE_NS))
+        else:
+            self.book.apply(action, order_id, side == "B", int(round(px * self.price_scale)), size)
+
+    def process(self, mbo: pd.DataFrame) -> List[dict]:
+        """Feed a micro batch of prepared events and return the records it finalized."""
+        n0 = len(self.records)
+        on_event = self.on_event
+        ts = mbo["ts_event"].to_numpy(dtype=np.int64).tolist() if "ts_event" in mbo.columns else \
+            mbo["ts"].to_numpy(dtype="datetime64[ns]").view(np.int64).tolist()
+        cols = zip(ts, mbo["action"].tolist(), mbo["side"].tolist(), mbo["px"].tolist(),
+                   mbo["size"].astype(np.int64).tolist(), mbo["order_id"].astype(np.int64).tolist())
+        for t, a, s, p, q, o in cols:
+            on_event(t, a, s, p, q, o)
+        return self.records[n0:]
+
+    def flush(self) -> List[dict]:
+        """Close the open minute and resolve every pending trade at the last mid."""
+        n0 = len(self.records)
+        if self._min is not None:
+            self._close_minute()
+            self._min = None
+        self._resolve(None)
+        if self._mid_min is not None:
+            self._push_mid(self._mid_last)
+            self._mid_min = None
+        self._emit_ready()
+        return self.records[n0:]
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.records).set_index("minute") if self.records else pd.DataFrame()
+
+    # ----- bucket boundaries
+
+    def _second_open(self, sec: int) -> None:
+        minute = sec - sec % MINUTE_NS
+        if minute != self._min:
+            if self._min is not None:
+                self._close_minute()
+            self._min = minute
+            self._bar = _Bar()
+            self._open = self._minute_open()
+        self._sec = sec
+
+        bids, asks = self.book.bids.ticks, self.book.asks.ticks
+        if not bids or not asks:
+            return
+        mid = (bids[-1] / self.price_scale + asks[0] / self.price_scale) * 0.5
+        self._resolve(sec)
+        self._on_second_mid(sec, mid)
+        self._sec_mid = mid
+        self._emit_ready()
+
+    def _minute_open(self) -> dict:
+        book, scale = self.book, self.price_scale
+        bids, asks = book.bids, book.asks
+        if not bids.ticks or not asks.ticks:
+            return {}
+        bt, at = bids.ticks[-1], asks.ticks[0]
+        bb, ba = bt / scale, at / scale
+        spread = ba - bb
+        mid = (bb + ba) * 0.5
+        rows = len(bids.ticks) + len(asks.ticks)
+        self._spread_sum += spread * rows
+        self._spread_rows += rows
+        ref = self.near_touch_spread if self.near_touch_spread is not None else self._spread_sum / self._spread_rows
+
+        lim = mid + self.multiple * ref
+        near_ask = 0
+        for t in asks.ticks:
+            if not t / scale < lim:
+                break
+            near_ask += asks.depth[t]
+        lim = mid - self.multiple * ref
+        near_bid = 0
+        for t in reversed(bids.ticks):
+            if not t / scale > lim:
+                break
+            near_bid += bids.depth[t]
+        return {
+            "best_bid": bb, "best_ask": ba,
+            "best_bid_depth": bids.depth[bt], "best_ask_depth": asks.depth[at],
+            "spread": spread, "mid_price": mid, "rel_spread": spread / mid,
+            "depth_near_ask": near_ask, "depth_near_bid": near_bid,
+        }
+
+    def _close_minute(self) -> None:
+        b, c = self._bar, self._bar.counts
+        rec = {
+            "minute": self._min,
+            "n_events": b.n_events,
+            "n_trades": c["T"],
+            "n_orders_new": c["A"] + c["F"] + c["R"],
+            "n_orders_add": c["A"],
+            "n_orders_cancel": c["C"],
+            "n_orders_replace": c["R"],
+            "n_orders_fill": c["F"],
+            "volume": b.volume,
+            "dollar_volume": b.dollar_volume,
+            "open": b.open, "high": b.high, "low": b.low, "close": b.close,
+            "vwap": b.dollar_volume / b.volume if b.volume else _NAN,
+            "n_buy": b.n_buy, "n_sell": b.n_sell,
+            "buy_volume": b.buy_volume, "sell_volume": b.sell_volume,
+            "signed_volume": b.buy_volume - b.sell_volume,
+        }
+        rec.update(self._open)
+        if c["T"]:
+            lp = math.log(b.close)
+            if self._log_px_prev == self._log_px_prev:
+                self.px_stats.update(lp - self._log_px_prev)
+            self._log_px_prev = lp
+        self._closed.append(rec)
+
+    def _on_second_mid(self, sec: int, mid: float) -> None:
+        # the minute mid is the last second mid in the minute, carried over empty minutes
+        minute = sec - sec % MINUTE_NS
+        if self._mid_min is None:
+            self._mid_min = minute
+        elif minute != self._mid_min:
+            self._push_mid(self._mid_last)
+            for _ in range((minute - self._mid_min) // MINUTE_NS - 1):
+                self._push_mid(self._mid_last)
+            self._mid_min = minute
+        self._mid_last = mid
+
+    def _push_mid(self, mid: float) -> None:
+        lm = math.log(mid)
+        if self._log_mid_prev == self._log_mid_prev:
+            self.mid_stats.update(lm - self._log_mid_prev)
+        self._log_mid_prev = lm
+
+    # ----- impact
+
+    def _resolve(self, sec: Optional[int]) -> None:
+        """Give pending trades with t + h before this second snapshot the previous snapshot mid."""
+        pending, h, mid_h = self._pending, self.horizon_ns, self._sec_mid
+        while pending and (sec is None or pending[0][0] + h < sec):
+            _, x, mid0, minute = pending.popleft()
+            if not (mid0 > 0 and mid_h > 0):
+                continue
+            y = math.log(mid_h / mid0)
+            s = self._impact.get(minute)
+            if s is None:
+                s = self._impact[minute] = [0.0, 0.0, 0.0, 0.0, 0.0]
+            s[0] += 1.0
+            s[1] += x
+            s[2] += y
+            s[3] += x * x
+            s[4] += x * y
+
+    def _emit_ready(self) -> None:
+        closed, pending = self._closed, self._pending
+        while closed and (not pending or pending[0][3] > closed[0]["minute"]):
+            rec = closed.popleft()
+            minute = rec["minute"]
+            s = self._impact.pop(minute, None)
+            alpha, beta = _ols(s) if s is not None else (_NAN, _NAN)
+
+            rolling = self._rolling
+            if s is not None:
+                rolling.append((minute, s))
+            while rolling and rolling[0][0] <= minute - self.window_ns:
+                rolling.popleft()
+            tot = [sum(v[i] for _, v in rolling) for i in range(5)]
+
+            rec["minute"] = pd.Timestamp(minute, tz="UTC").tz_convert(self.tz)
+            rec.update({
+                "alpha": alpha,
+                f"beta_{self.horizon_seconds:g}s": beta,
+                "n_impact": int(s[0]) if s is not None else 0,
+                "beta_rolling": _ols(tot)[1],
+                "rv_mid": self.mid_stats.rv,
+                "rv_px": self.px_stats.rv,
+                "acf1_mid": self.mid_stats.acf()[0] if self.mid_stats.nlags else _NAN,
+                "acf1_px": self.px_stats.acf()[0] if self.px_stats.nlags else _NAN,
+            })
+            self.records.append(rec)
+            if self.on_bucket is not None:
+                self.on_bucket(rec)
@@ -0,0 +1,346 @@
+from __future__ import annotations
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .arbitrage import split_pair
+from .book import PRICE_SCALE, PriceLadder
+from .metrics import session_bounds
+
+# ---------- event clock
+
+def session_event_times(
+    n: int,
+    session_date: str,
+    rng: np.random.Generator,
+    tz: str = "America/New_York",
+    u_shape: float = 3.0,
+    burst_vol: float = 0.6,
+    burst_persistence: float = 0.97,
+) -> np.ndarray:
+    """n sorted UTC ns timestamps over the regular session, clustered in bursts."""
+    sod, eod = session_bounds(session_date, tz)
+    n_sec = int((eod - sod).total_seconds())
+    x = (np.arange(n_sec) + 0.5) / n_sec
+    shock = rng.normal(0.0, burst_vol * math.sqrt(1 - burst_persistence**2), n_sec)
+    log_f = np.empty(n_sec)
+    acc = 0.0
+    for i, e in enumerate(shock.tolist()):
+        acc = burst_persistence * acc + e
+        log_f[i] = acc
+    w = (1.0 + u_shape * (2 * x - 1) ** 2) * np.exp(log_f)
+    counts = rng.multinomial(n, w / w.sum())
+    sec = np.repeat(np.arange(n_sec, dtype=np.int64), counts)
+    frac = (rng.random(n) * 1e9).astype(np.int64)
+    return np.sort(sod.value + sec * 1_000_000_000 + frac)
+
+# ---------- market by order
+
+MBO_COLUMNS = ["ts_event", "symbol", "action", "side", "price", "size", "order_id", "sequence"]
+
+def _lot_sizes(rng: np.random.Generator, n: int, mean_log: float = 4.5) -> np.ndarray:
+    """Order sizes, mostly round lots of 100 with a tail of odd lots."""
+    raw = np.exp(rng.normal(mean_log, 1.0, n))
+    lots = np.maximum(np.rint(raw / 100.0), 1) * 100
+    odd = np.maximum(np.rint(raw / 4.0), 1)
+    return np.where(rng.random(n) < 0.7, lots, odd).astype(np.int64)
+
+def synthetic_mbo(
+    n_events: int,
+    symbol: str = "SYNT",
+    session_date: str = "2025-07-22",
+    seed: int = 0,
+    tz: str = "America/New_York",
+    start_price: float = 100.0,
+    tick_size: float = 0.01,
+    book_orders: int = 400,
+    p_add: float = 0.5,
+    p_cancel: float = 0.4,
+    p_modify: float = 0.05,
+    p_id_reuse: float = 0.02,
+    price_in_nanos: bool = True,
+) -> pd.DataFrame:
+    """Seeded Databento style MBO stream for one symbol and session."""
+    rng = np.random.default_rng(seed)
+    times = session_event_times(n_events, session_date, rng, tz)
+    u_act, u_side, u_pick, u_aux = (rng.random(n_events) for _ in range(4))
+    depth_k = rng.geometric(0.15, n_events) - 1
+    sizes = _lot_sizes(rng, n_events)
+    trade_sizes = _lot_sizes(rng, n_events, mean_log=6.5)
+    u_act, u_side, u_pick, u_aux = (a.tolist() for a in (u_act, u_side, u_pick, u_aux))
+    depth_k, sizes, trade_sizes = depth_k.tolist(), sizes.tolist(), trade_sizes.tolist()
+
+    tick_nanos = int(round(tick_size * PRICE_SCALE))
+    mid0 = int(round(start_price / tick_size))
+    bids, asks = PriceLadder(True), PriceLadder(False)
+    queues: Tuple[Dict[int, List[int]], Dict[int, List[int]]] = ({}, {})  # ask, bid FIFO per tick
+    orders: Dict[int, List[int]] = {}  # oid -> [is_bid, tick, size]
+    live: List[int] = []
+    where: Dict[int, int] = {}
+    dead: List[int] = []
+    next_id = 1_000_000
+    sign = 1
+    c_add, c_cancel, c_modify = p_add, p_add + p_cancel, p_add + p_cancel + p_modify
+
+    r_step, r_act, r_side, r_tick, r_size, r_oid = [], [], [], [], [], []
+    def emit(step, act, is_bid, tick, size, oid):
+        r_step.append(step)
+        r_act.append(act)
+        r_side.append(is_bid)
+        r_tick.append(tick)
+        r_size.append(size)
+        r_oid.append(oid)
+
+    def drop(oid):
+        i = where.pop(oid)
+        last = live.pop()
+        if last != oid:
+            live[i] = last
+            where[last] = i
+        del orders[oid]
+        dead.append(oid)
+
+    def unqueue(is_bid, tick, oid):
+        q = queues[is_bid][tick]
+        q.remove(oid)
+        if not q:
+            del queues[is_bid][tick]
+
+    step = 0
+    while len(r_step) < n_events and step < n_events:
+        u = u_act[step]
+        warm = not bids.ticks or not asks.ticks or len(live) < book_orders // 2
+        if warm or u < c_add and len(live) < book_orders:
+            if bool(bids.ticks) != bool(asks.ticks):
+                is_bid = not bids.ticks
+            else:
+                is_bid = u_side[step] < 0.5
+            bb = bids.ticks[-1] if bids.ticks else None
+            ba = asks.ticks[0] if asks.ticks else None
+            # wide spreads get filled in quickly, tight ones rarely improve
+            improve = u_aux[step] < (0.6 if bb is not None and ba is not None and ba - bb > 2 else 0.1)
+            if is_bid:
+                ref = bb if bb is not None else (ba - 1 if ba is not None else mid0 - 1)
+                tick = ref + 1 if improve else ref - depth_k[step]
+                if ba is not None:
+                    tick = min(tick, ba - 1)
+            else:
+                ref = ba if ba is not None else (bb + 1 if bb is not None else mid0 + 1)
+                tick = ref - 1 if improve else ref + depth_k[step]
+                if bb is not None:
+                    tick = max(tick, bb + 1)
+            if dead and u_pick[step] < p_id_reuse:
+                j = int(u_pick[step] / p_id_reuse * len(dead)) % len(dead)
+                dead[j], dead[-1] = dead[-1], dead[j]
+                oid = dead.pop()
+            else:
+                oid = next_id
+                next_id += 1
+            size = sizes[step]
+            orders[oid] = [is_bid, tick, size]
+            where[oid] = len(live)
+            live.append(oid)
+            queues[is_bid].setdefault(tick, []).append(oid)
+            (bids if is_bid else asks).change(tick, size)
+            emit(step, "A", is_bid, tick, size, oid)
+        elif u < c_cancel or u < c_add:
+            oid = live[int(u_pick[step] * len(live))]
+            is_bid, tick, size = orders[oid]
+            dq = size
+            if u_aux[step] < 0.15 and size > 1:
+                dq = max(1, int(size * u_side[step]))
+            (bids if is_bid else asks).change(tick, -dq)
+            if dq < size:
+                orders[oid][2] = size - dq
+            else:
+                unqueue(is_bid, tick, oid)
+                drop(oid)
+            emit(step, "C", is_bid, tick, dq, oid)
+        elif u < c_modify:
+            oid = live[int(u_pick[step] * len(live))]
+            is_bid, tick, size = orders[oid]
+            lad = bids if is_bid else asks
+            lad.change(tick, -size)
+            unqueue(is_bid, tick, oid)
+            tick2 = tick + int(u_aux[step] * 3) - 1
+            if is_bid and asks.ticks:
+                tick2 = min(tick2, asks.ticks[0] - 1)
+            elif not is_bid and bids.ticks:
+                tick2 = max(tick2, bids.ticks[-1] + 1)
+            size2 = sizes[step]
+            orders[oid] = [is_bid, tick2, size2]
+            lad.change(tick2, size2)
+            queues[is_bid].setdefault(tick2, []).append(oid)
+            emit(step, "R", is_bid, tick2, size2, oid)
+        else:
+            if u_aux[step] < 0.03:
+                emit(step, "T", None, (bids.ticks[-1] + asks.ticks[0]) * tick_nanos // 2, trade_sizes[step], 0)
+                step += 1
+                continue
+            if u_side[step] < 0.3:
+                sign = -sign
+            buy = sign > 0
+            lad = asks if buy else bids
+            q_side = not buy
+            left = trade_sizes[step]
+            while left > 0 and len(lad.ticks) > 1:
+                tick = lad.ticks[0] if buy else lad.ticks[-1]
+                queue = queues[q_side][tick]
+                while left > 0 and queue:
+                    oid = queue[0]
+                    rest = orders[oid]
+                    fill = min(left, rest[2])
+                    left -= fill
+                    rest[2] -= fill
+                    lad.change(tick, -fill)
+                    emit(step, "T", buy, tick, fill, 0)
+                    emit(step, "F", q_side, tick, rest[2], oid)
+                    if rest[2] == 0:
+                        queue.pop(0)
+                        drop(oid)
+                if not queue:
+                    del queues[q_side][tick]
+        step += 1
+
+    n = min(len(r_step), n_events)
+    side = np.array(["N", "A", "B"])[[0 if s is None else 1 + s for s in r_side[:n]]]
+    act = np.array(r_act[:n])
+    tick = np.asarray(r_tick[:n], dtype=np.int64)
+    nanos = np.where((act == "T") & (side == "N"), tick, tick * tick_nanos)
+    df = pd.DataFrame({
+        "ts_event": times[np.asarray(r_step[:n], dtype=np.int64)],
+        "symbol": symbol,
+        "action": act,
+        "side": side,
+        "price": nanos if price_in_nanos else nanos / PRICE_SCALE,
+        "size": np.asarray(r_size[:n], dtype=np.int64),
+        "order_id": np.asarray(r_oid[:n], dtype=np.uint64),
+        "sequence": np.arange(n, dtype=np.int64),
+    })
+    return df[MBO_COLUMNS]
+
+# ---------- EBS wide block tables
+
+# starting value of one unit in USD, pair mids are ratios of these
+USD_VALUE = {"USD": 1.0, "EUR": 1.16, "GBP": 1.34, "JPY": 1 / 147.5, "CHF": 1.25, "AUD": 0.65}
+
+def ebs_tick_size(pair: str) -> float:
+    return 1e-3 if pair.endswith("JPY") else 1e-5
+
+def _ebs_time(ns: np.ndarray) -> np.ndarray:
+    return pd.to_datetime(ns).strftime("%Y-%m-%d %H:%M:%S.%f").to_numpy(dtype=object)
+
+def _wide(ns: np.ndarray, pair_code: np.ndarray, pairs: Sequence[str], prefix: str, fields: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Spread long (row, pair) records into one block of columns per pair, empty elsewhere."""
+    cols: Dict[str, object] = {"Time": _ebs_time(ns)}
+    for j, p in enumerate(pairs):
+        mine = pair_code == j
+        for f, v in fields.items():
+            if v.dtype.kind in "fi":
+                cols[f"{prefix}{p}.{f}"] = np.where(mine, v, np.nan)
+            else:
+                cols[f"{prefix}{p}.{f}"] = np.where(mine, v, None)
+    return pd.DataFrame(cols)
+
+def synthetic_ebs(
+    n_records: int,
+    pairs: Optional[Sequence[str]] = None,
+    session_date: str = "2025-07-22",
+    seed: int = 0,
+    trade_ratio: float = 0.2,
+    levels: int = 5,
+    vol_per_record: float = 3e-6,
+    idio_vol: float = 3e-6,
+    p_delete: float = 0.3,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Seeded EBS order and trade tables in the vendor's wide block layout."""
+    pairs = list(pairs or ["EUR/USD", "USD/JPY", "EUR/JPY"])
+    rng = np.random.default_rng(seed)
+    ns = session_event_times(n_records, session_date, rng, "UTC")
+    ccy = sorted({c for p in pairs for c in split_pair(p)})
+    cix = {c: i for i, c in enumerate(ccy)}
+
+    code = rng.integers(len(pairs), size=n_records)
+    steps = rng.normal(0.0, vol_per_record, (n_records, len(ccy))).tolist()
+    idio = rng.normal(0.0, idio_vol, n_records).tolist()
+    side_draw = rng.integers(2, size=n_records).tolist()
+    k_draw = rng.integers(0, levels, size=n_records).tolist()
+    u_del = rng.random(n_records).tolist()
+    sz_draw = (rng.integers(1, 20, size=n_records) * 1_000_000).tolist()
+    nparts = rng.integers(1, 6, size=n_records).tolist()
+    tick_size = [ebs_tick_size(p) for p in pairs]
+    legs = [tuple(cix[c] for c in split_pair(p)) for p in pairs]
+
+    books: List[Dict[Tuple[int, int], int]] = [{} for _ in pairs]
+    mid_tick = [None] * len(pairs)
+    dev = [0.0] * len(pairs)
+    seq = [0] * len(pairs)
+    xs = [math.log(USD_VALUE[c]) for c in ccy]
+    o_i, o_pair, o_side, o_tick, o_size, o_np, o_del = [], [], [], [], [], [], []
+    def rec(i, j, side, tick, size, parts, deleted):
+        seq[j] += 1
+        o_i.append(i); o_pair.append(j); o_side.append(side); o_tick.append(tick)
+        o_size.append(size); o_np.append(parts); o_del.append(deleted)
+
+    tob = np.full((n_records, 2), np.nan)  # best bid and ask tick of the pair updated at each record
+    for i in range(n_records):
+        xs = [a + e for a, e in zip(xs, steps[i])]
+        j = int(code[i])
+        b, q = legs[j]
+        dev[j] = 0.995 * dev[j] + idio[i]
+        m = int(math.floor(math.exp(xs[b] - xs[q] + dev[j]) / tick_size[j]))
+        book = books[j]
+        old = mid_tick[j]
+        if old is not None and m != old:
+            # bids at or above the new mid and asks at or below it are pulled
+            for key in [k for k in book if (k[0] == 0 and k[1] > m) or (k[0] == 1 and k[1] <= m)]:
+                del book[key]
+                rec(i, j, key[0], key[1], 0, 0, True)
+        mid_tick[j] = m
+        side = side_draw[i]
+        tick = m - k_draw[i] if side == 0 else m + 1 + k_draw[i]
+        key = (side, tick)
+        if key in book and u_del[i] < p_delete:
+            del book[key]
+            rec(i, j, side, tick, 0, 0, True)
+        else:
+            book[key] = sz_draw[i]
+            rec(i, j, side, tick, sz_draw[i], nparts[i], False)
+        bid = max((k[1] for k in book if k[0] == 0), default=None)
+        ask = min((k[1] for k in book if k[0] == 1), default=None)
+        tob[i] = (np.nan if bid is None else bid, np.nan if ask is None else ask)
+
+    oi = np.asarray(o_i, dtype=np.int64)
+    opair = np.asarray(o_pair, dtype=np.int64)
+    deleted = np.asarray(o_del)
+    ticks = np.asarray(tick_size)[opair]
+    seqs = np.empty(len(oi), dtype=np.int64)
+    for j in range(len(pairs)):
+        mine = opair == j
+        seqs[mine] = np.arange(1, mine.sum() + 1)
+    o_ns = ns[oi]
+    orders = _wide(o_ns, opair, pairs, "EBS_BOOK::", {
+        "DELETED_TIME": np.where(deleted, pd.to_datetime(o_ns).strftime("%H:%M:%S.%f").to_numpy(dtype=object), None),
+        "NUM_PARTCP": np.asarray(o_np, dtype=float),
+        "BUY_SELL_FLAG": np.asarray(o_side, dtype=float),
+        "TICK_STATUS": np.zeros(len(oi)),
+        "RECORD_TYPE": np.where(deleted, 2.0, 1.0),
+        "PRICE": np.round(np.asarray(o_tick) * ticks, 6),
+        "SIZE": np.asarray(o_size, dtype=float),
+        "OMDSEQ": seqs.astype(float),
+    })
+
+    m_tr = int(n_records * trade_ratio)
+    at = np.sort(rng.choice(n_records, size=m_tr, replace=True))
+    at = at[np.isfinite(tob[at]).all(axis=1)]
+    aggressor = rng.integers(2, size=len(at))
+    t_tick = np.where(aggressor == 1, tob[at, 1], tob[at, 0])
+    t_pair = code[at]
+    trades = _wide(ns[at], t_pair, pairs, "EBS_TRADE::", {
+        "PRICE": np.round(t_tick * np.asarray(tick_size)[t_pair], 6),
+        "SIZE": (rng.integers(1, 10, size=len(at)) * 1_000_000).astype(float),
+        "BUY_SELL_FLAG": aggressor.astype(float),
+    })
+    return orders, trades
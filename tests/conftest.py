@@ -0,0 +1,43 @@
+import pathlib
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "src"))
+
+# (time after 09:30, action, side, price, size, order id) covering add, partial and full
+# cancel, modify to a new price, fill with the remaining size and levels emptying to zero
+HAND_EVENTS = [
+    ("00:00.100", "A", "B", 100.00, 100, 1),
+    ("00:00.200", "A", "B", 99.99, 50, 2),
+    ("00:00.300", "A", "A", 100.02, 70, 3),
+    ("00:00.400", "A", "A", 100.03, 30, 4),
+    ("00:01.100", "C", "B", 100.00, 40, 1),
+    ("00:01.200", "R", "B", 100.00, 20, 2),
+    ("00:01.300", "T", "B", 100.02, 40, 0),
+    ("00:01.300", "F", "A", 100.02, 30, 3),
+    ("00:02.500", "C", "A", 100.03, 30, 4),
+    ("00:02.600", "A", "A", 100.01, 10, 5),
+    ("01:00.500", "C", "B", 100.00, 60, 1),
+    ("01:00.600", "A", "B", 99.98, 25, 6),
+    ("01:01.000", "A", "A", 100.05, 5, 7),
+    ("01:01.500", "C", "A", 100.01, 10, 5),
+    ("02:00.000", "A", "B", 99.97, 15, 8),
+]
+
+@pytest.fixture
+def hand_mbo():
+    from microstructure.metrics import prepare_session
+    t0 = pd.Timestamp("2025-07-22 09:30", tz="America/New_York")
+    raw = pd.DataFrame({
+        "ts_event": [(t0 + pd.Timedelta("00:" + t)).value for t, *_ in HAND_EVENTS],
+        "symbol": "HAND",
+        "action": [e[1] for e in HAND_EVENTS],
+        "side": [e[2] for e in HAND_EVENTS],
+        "price": [round(e[3] * 1e9) for e in HAND_EVENTS],
+        "size": [e[4] for e in HAND_EVENTS],
+        "order_id": [e[5] for e in HAND_EVENTS],
+        "sequence": range(len(HAND_EVENTS)),
+    })
+    return prepare_session(raw, "HAND", "2025-07-22")
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from microstructure.arbitrage import SUMMARY_COLUMNS, scan_cycles
+
+PAIRS = ["EUR/USD", "USD/JPY", "EUR/JPY"]
+
+def _tob(rows):
+    return pd.DataFrame(rows, columns=["timestamp", "pair", "bid", "ask", "bid_size", "ask_size"])
+
+def test_scan_cycles_without_records_returns_empty_frames():
+    summary, gaps = scan_cycles(_tob([]), PAIRS)
+    assert list(summary.columns) == SUMMARY_COLUMNS and summary.empty
+    assert gaps.empty and list(gaps.columns) == ["EUR>JPY>USD>EUR"]
+
+def test_capacity_median_covers_all_valid_seconds():
+    t0 = pd.Timestamp("2025-07-22 09:30:00")
+    rows = [(t0, "EUR/USD", 1.0999, 1.1001, 5, 5), (t0, "USD/JPY", 149.99, 150.01, 7, 7), (t0, "EUR/JPY", 164.99, 165.01, 9, 9)]
+    # a rich EUR/JPY quote for two seconds, with smaller depth
+    rows += [(t0 + pd.Timedelta(seconds=3), "EUR/JPY", 166.0, 166.02, 2, 2), (t0 + pd.Timedelta(seconds=5), "EUR/JPY", 164.99, 165.01, 9, 9)]
+    rows += [(t0 + pd.Timedelta(seconds=9), "EUR/USD", 1.0999, 1.1001, 5, 5)]
+    summary, gaps = scan_cycles(_tob(rows), PAIRS, tau=1e-3)
+    row = summary.iloc[0]
+    assert row["n_valid"] == 10 and row["n_flagged"] == 2
+    assert row["capacity_median_flagged"] == 2
+    assert row["capacity_median"] == 5
+    assert np.isfinite(gaps.to_numpy()).all()
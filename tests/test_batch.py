@@ -0,0 +1,46 @@
+import multiprocessing
+import os
+
+import pandas as pd
+import pytest
+
+from microstructure import batch
+
+forked = pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork", reason="workers must inherit the patched job function"
+)
+
+def _die_or_ok(job):
+    if job["symbol"] == "BOOM":
+        os._exit(1)  # as if the worker were killed for memory
+    return {"status": "ok", "error": "", "seconds": 0.0}
+
+def _jobs(symbols):
+    return [{"symbol": s, "session_date": "2025-07-22", "csv_path": f"/nonexistent/{s}.csv", "price_in_nanos": True} for s in symbols]
+
+@pytest.fixture
+def dying_worker(monkeypatch):
+    monkeypatch.setattr(batch, "_run_job", _die_or_ok)
+
+@forked
+def test_dead_worker_is_retried_on_a_fresh_pool(tmp_path, dying_worker):
+    status = batch.run_batch(_jobs(["AAA", "BOOM", "BBB", "CCC"]), str(tmp_path), workers=1, retries=1)
+    saved = pd.read_csv(tmp_path / "batch_status.csv", dtype={"session_date": str}).set_index("symbol")
+    assert sorted(saved.index) == ["AAA", "BBB", "BOOM", "CCC"]
+    assert saved.loc["BOOM", "status"] == "failed" and saved.loc["BOOM", "attempts"] == 2
+    assert "BrokenProcessPool" in saved.loc["BOOM", "error"]
+    assert (saved.drop(index="BOOM")["status"] == "ok").all()
+    assert len(status) == 4
+
+@forked
+def test_every_job_is_recorded_when_workers_die_in_parallel(tmp_path, dying_worker):
+    symbols = ["AAA", "BOOM", "BBB", "CCC", "DDD", "EEE"]
+    batch.run_batch(_jobs(symbols), str(tmp_path), workers=2, retries=2)
+    saved = pd.read_csv(tmp_path / "batch_status.csv")
+    assert sorted(saved["symbol"]) == sorted(symbols)
+    assert saved.set_index("symbol").loc["BOOM", "status"] == "failed"
+
+def test_no_jobs_writes_an_empty_status(tmp_path):
+    status = batch.run_batch([], str(tmp_path), workers=1)
+    assert status.empty and list(status.columns[:len(batch.STATUS_COLUMNS)]) == batch.STATUS_COLUMNS
+    assert (tmp_path / "batch_status.csv").exists()
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from microstructure.book import L2_COLUMNS, replay_book
+from microstructure.metrics import build_l2_by_bucket
+
+def legacy_l2_by_bucket(mbo, bucket):
+    # the per-event dict replay build_l2_by_bucket used before the OrderBook engine
+    orders, levels, recs = {}, {"B": {}, "A": {}}, []
+    current = mbo[bucket].iloc[0]
+    def best(side):
+        keys = [p for p, q in levels[side].items() if q > 0]
+        p = (max if side == "B" else min)(keys) if keys else None
+        return p, levels[side][p] if keys else 0
+    for r in mbo.itertuples(index=False):
+        act, oid, side, px, sz, b = r.action, int(r.order_id), r.side, float(r.px), int(r.size), getattr(r, bucket)
+        if b > current:
+            (bb, bq), (ba, aq) = best("B"), best("A")
+            if bb is not None and ba is not None:
+                for s in ("A", "B"):
+                    recs += [(b, s, p, q, bb, ba, bq, aq, ba - bb) for p, q in levels[s].items() if q > 0]
+            current = b
+        if act in ("A", "F", "R") and (act != "R" or oid in orders):
+            if oid in orders:
+                s_old, p_old, q_old = orders.pop(oid)
+                levels[s_old][p_old] -= q_old
+            orders[oid] = (side, px, sz)
+            levels[side][px] = levels[side].get(px, 0) + sz
+        elif act == "C" and oid in orders:
+            s_old, p_old, q_old = orders[oid]
+            dq = min(sz, q_old)
+            levels[s_old][p_old] -= dq
+            if q_old - dq > 0:
+                orders[oid] = (s_old, p_old, q_old - dq)
+            else:
+                del orders[oid]
+    return pd.DataFrame(recs, columns=L2_COLUMNS).set_index("ts")
+
+def _canon(l2):
+    return l2.reset_index().sort_values(["ts", "side", "price"]).reset_index(drop=True)[L2_COLUMNS]
+
+@pytest.mark.parametrize("bucket", ["second", "minute"])
+def test_l2_by_bucket_matches_legacy_replay(hand_mbo, bucket):
+    got, ref = _canon(build_l2_by_bucket(hand_mbo, bucket)), _canon(legacy_l2_by_bucket(hand_mbo, bucket))
+    assert len(got) == len(ref) > 0
+    assert (got[["ts", "side"]] == ref[["ts", "side"]]).all().all()
+    assert np.allclose(got.drop(columns=["ts", "side"]).to_numpy(float), ref.drop(columns=["ts", "side"]).to_numpy(float))
+
+def test_hand_book_states(hand_mbo):
+    snaps, tape = replay_book(hand_mbo, ["second", "minute"])
+    tob = snaps["second"].top_of_book()
+    # after the partial cancel, the modify onto 100.00 emptying 99.99 and the fill leaving 30 at 100.02
+    s2 = tob.loc[pd.Timestamp("2025-07-22 09:30:02", tz="America/New_York")]
+    assert (s2["best_bid"], s2["best_bid_depth"], s2["best_ask"], s2["best_ask_depth"]) == (100.00, 80, 100.02, 30)
+    l2 = snaps["second"].to_frame()
+    at2 = l2.loc[pd.Timestamp("2025-07-22 09:30:02", tz="America/New_York")]
+    assert sorted(zip(at2["side"], at2["price"].round(2), at2["depth"])) == [("A", 100.02, 30), ("A", 100.03, 30), ("B", 100.0, 80)]
+    # the next minute opens with 100.03 emptied and 100.01 added on the ask
+    m1 = snaps["minute"].top_of_book().iloc[0]
+    assert (m1["best_bid"], m1["best_bid_depth"], m1["best_ask"], m1["best_ask_depth"]) == (100.00, 80, 100.01, 10)
+    # the tape sees every change to the best quotes, the last one after order 5 leaves
+    assert tape.mid_at(np.array([hand_mbo["ts"].iloc[-1].value]))[0] == pytest.approx((100.00 + 100.02) / 2)
@@ -0,0 +1,28 @@
+from microstructure.book_index import BookIndex
+from microstructure.metrics import prepare_session
+from microstructure.synthetic import synthetic_mbo
+
+def _session():
+    return prepare_session(synthetic_mbo(5_000, "SYNT", "2025-07-22", seed=2), "SYNT", "2025-07-22")
+
+def _state(book):
+    return book.best_bid(), book.best_ask(), book.bids.levels(), book.asks.levels()
+
+def test_earlier_book_is_not_moved_by_a_later_query():
+    bi = BookIndex(_session(), every_events=1_000)
+    n = bi.positions[2]
+    a = bi.book_after(n + 5)
+    before = _state(a)
+    b = bi.book_after(n + 400)
+    assert a is not b
+    assert _state(a) == before
+    assert _state(b) != before
+
+def test_book_after_matches_a_full_replay():
+    mbo = _session()
+    bi = BookIndex(mbo, every_events=700)
+    for n in (0, 1, 699, 700, 2_345, len(mbo)):
+        ref = BookIndex(mbo.iloc[:n], every_events=None) if n else None
+        got = bi.book_after(n)
+        if ref is not None:
+            assert _state(got) == _state(ref.book_after(n))
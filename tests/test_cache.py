@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from microstructure import cache as cache_mod
+from microstructure.cache import SessionCache
+
+@pytest.fixture
+def session_cache(tmp_path):
+    src = tmp_path / "HAND.csv"
+    src.write_text("hand\n")
+    return SessionCache(str(tmp_path / "cache")), str(src)
+
+def test_book_round_trips_through_the_cache(session_cache, hand_mbo, monkeypatch):
+    cache, src = session_cache
+    entry = cache.entry(src, "HAND", "2025-07-22", kind="book")
+    built, tape = cache.book(entry, hand_mbo, ["second", "minute"])
+
+    def no_replay(*a, **k):
+        raise AssertionError("a warm entry must not replay the book")
+    monkeypatch.setattr(cache_mod, "replay_book", no_replay)
+    again, tape2 = cache.book(cache.entry(src, "HAND", "2025-07-22", kind="book"), hand_mbo, ["second", "minute"])
+    for r in ("second", "minute"):
+        assert list(again[r].ts) == list(built[r].ts)
+        assert np.array_equal(again[r].tob, built[r].tob)
+        pd.testing.assert_frame_equal(again[r].to_frame(), built[r].to_frame())
+    assert np.array_equal(tape2.pos, tape.pos)
+    assert np.array_equal(tape2.mid, tape.mid, equal_nan=True)
+
+def test_concurrent_entry_creation(session_cache):
+    cache, src = session_cache
+    with ThreadPoolExecutor(8) as ex:
+        paths = list(ex.map(lambda _: cache.entry(src, "HAND", "2025-07-22", n=1), range(32)))
+    assert len(set(paths)) == 1 and (paths[0] / "meta.json").exists()
+    assert cache.entries() == paths[:1]
+
+def test_evict_skips_entries_in_use(session_cache):
+    cache, src = session_cache
+    entry = cache.entry(src, "HAND", "2025-07-22", n=1)
+    cache.frame(entry, "x", lambda: pd.DataFrame({"a": range(10)}))
+    cache.max_bytes = 0
+    with cache._locked(entry):
+        assert cache.evict() == 0 and entry.exists()
+    assert cache.evict() == 1 and not entry.exists()
+    # a holder that outlived the eviction recreates the entry before writing into it
+    cache.frame(entry, "x", lambda: pd.DataFrame({"a": range(3)}))
+    assert (entry / "meta.json").exists() and len(cache._read(entry, "x")) == 3
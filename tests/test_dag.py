@@ -0,0 +1,32 @@
+import threading
+
+from microstructure.dag import StageGraph
+from microstructure.profiling import RunProfile
+
+def _graph(seen, workers=2):
+    def record(name, value):
+        seen[name] = threading.get_ident()
+        return value
+    g = StageGraph(workers=workers)
+    g.add("events", lambda n: record("events", list(range(n))), params=["n"])
+    g.add("left", lambda events: record("left", events[::2]), ["events"], counts=lambda value, events: {"events": len(events), "rows": len(value)})
+    g.add("right", lambda events: record("right", events[1::2]), ["events"])
+    return g
+
+def test_counts_give_events_and_throughput():
+    prof = RunProfile("t")
+    _graph({}).run({"n": 10}, profile=prof)
+    left = next(s for s in prof.stages if s["stage"] == "left")
+    assert left["events"] == 10 and left["rows"] == 5 and "events_per_sec" in left
+    right = next(s for s in prof.stages if s["stage"] == "right")
+    assert right["rows"] == 5 and "events" not in right
+
+def test_profiled_runs_compute_on_the_calling_thread(tmp_path):
+    seen = {}
+    prof = RunProfile("t", profiler="cprofile")
+    try:
+        _graph(seen, workers=4).run({"n": 10}, profile=prof)
+    finally:
+        prof.write(tmp_path / "report.json")
+    assert set(seen) == {"events", "left", "right"}
+    assert set(seen.values()) == {threading.get_ident()}
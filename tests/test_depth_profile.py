@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from microstructure.book import build_l2_snapshots
+from microstructure.metrics import depth_profile
+
+BANDS = (0.5, 1, 2, 3)
+
+def _brute_force(snaps, spread, window):
+    l2 = snaps.to_frame().reset_index()
+    tob = snaps.top_of_book()
+    ref = tob["spread"] if spread == "bucket" else tob["spread"].rolling(window, min_periods=1).mean()
+    rows = []
+    for ts, g in l2.groupby("ts", sort=True):
+        mid = (tob.loc[ts, "best_bid"] + tob.loc[ts, "best_ask"]) / 2
+        for side in ("A", "B"):
+            s = g[g["side"] == side]
+            for b in BANDS:
+                # widths and distances are whole half cents here, so a small tolerance decides "<" exactly
+                near = (s["price"] - mid).abs() < ref.loc[ts] * b - 1e-9
+                rows.append((ts, side, b, int(s.loc[near, "depth"].sum())))
+    return pd.DataFrame(rows, columns=["ts", "side", "band", "depth"])
+
+@pytest.mark.parametrize("spread,window", [("bucket", 60), ("rolling", 3)])
+def test_depth_profile_matches_a_frame_filter(hand_mbo, spread, window):
+    snaps = build_l2_snapshots(hand_mbo, ["second"])["second"]
+    got = depth_profile(snaps, BANDS, spread=spread, window=window)
+    want = _brute_force(snaps, spread, window)
+    assert want["depth"].sum() > 0
+    pd.testing.assert_frame_equal(got.reset_index(drop=True), want, check_dtype=False)
+
+def test_bucket_and_rolling_differ_once_the_spread_moves(hand_mbo):
+    snaps = build_l2_snapshots(hand_mbo, ["second"])["second"]
+    spreads = snaps.top_of_book()["spread"]
+    assert spreads.nunique() > 1
+    bucket = depth_profile(snaps, BANDS, spread="bucket")
+    rolling = depth_profile(snaps, BANDS, spread="rolling", window=len(snaps))
+    assert not bucket["depth"].equals(rolling["depth"])
+    # the first bucket has no history, so its trailing mean is its own spread
+    first = bucket["ts"] == bucket["ts"].iloc[0]
+    assert bucket.loc[first, "depth"].equals(rolling.loc[first, "depth"])
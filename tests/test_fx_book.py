@@ -0,0 +1,37 @@
+import pandas as pd
+
+from microstructure.fx_book import replay_fx_book
+
+def _orders():
+    t0 = pd.Timestamp("2025-07-22 09:30")
+    # (ms, pair, side, price, size, OMDSEQ); EURUSD sequence numbers run against time for two records
+    rows = [
+        (0, "EURUSD", 0, 1.1000, 5, 1),
+        (10, "EURUSD", 1, 1.1002, 3, 2),
+        (30, "EURUSD", 1, 1.1002, 0, 3),
+        (20, "EURUSD", 0, 1.1001, 2, 4),
+        (5, "USDJPY", 0, 150.10, 1, 1),
+        (25, "USDJPY", 1, 150.12, 4, 2),
+        (20, "EURUSD", 1, 1.1003, 1, 5),
+    ]
+    return pd.DataFrame({
+        "timestamp": [t0 + pd.Timedelta(milliseconds=r[0]) for r in rows],
+        "pair": [r[1] for r in rows],
+        "side": [r[2] for r in rows],
+        "price": [r[3] for r in rows],
+        "size": [r[4] for r in rows],
+        "OMDSEQ": [r[5] for r in rows],
+    })
+
+def test_states_follow_time_order_within_each_pair():
+    tob = replay_fx_book(_orders())
+    assert tob["timestamp"].is_monotonic_increasing
+    eur = tob[tob["pair"] == "EURUSD"].reset_index(drop=True)
+    # the 1.1002 ask is deleted at 30ms (OMDSEQ 3), after both 20ms records, so it is still best at 20ms
+    assert list(eur["timestamp"].dt.microsecond // 1000) == [0, 10, 20, 20, 30]
+    assert list(eur["bid"]) == [1.1, 1.1, 1.1001, 1.1001, 1.1001]
+    assert list(eur["ask"].iloc[1:]) == [1.1002, 1.1002, 1.1002, 1.1003]
+    last = eur.iloc[-1]
+    assert (last["bid_size"], last["ask_size"]) == (2, 1)
+    jpy = tob[tob["pair"] == "USDJPY"]
+    assert list(jpy["ask"].isna()) == [True, False]
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from microstructure.loaders import EBS_ORDER_FIELDS, EBS_TRADE_FIELDS, read_ebs_block
+from microstructure.synthetic import synthetic_ebs
+
+PAIRS = ["EUR/USD", "USD/JPY", "EUR/JPY"]
+
+def pandas_ebs_block(path, pairs, fields, prefixes, start="09:30:00", end="16:00:00"):
+    # the pandas reader read_ebs_block replaced, with empty block rows dropped
+    raw = pd.read_csv(path)
+    parts = []
+    for p in pairs:
+        cols = {}
+        for f in fields:
+            for pref in prefixes:
+                if f"{pref}{p}.{f}" in raw.columns:
+                    cols[f] = f"{pref}{p}.{f}"
+                    break
+        if not cols:
+            continue
+        out = raw[["Time"] + list(cols.values())].copy()
+        out.columns = ["timestamp"] + list(cols)
+        out["pair"] = p
+        parts.append(out)
+    df = pd.concat(parts, ignore_index=True)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    df = df.dropna(subset=["timestamp"])
+    t = df["timestamp"].dt.time
+    df = df[(t >= pd.Timestamp(start).time()) & (t <= pd.Timestamp(end).time())]
+    return df.dropna(subset=[f for f in fields if f in df], how="all")
+
+@pytest.fixture(scope="module")
+def ebs_csv(tmp_path_factory):
+    d = tmp_path_factory.mktemp("ebs")
+    orders, trades = synthetic_ebs(3_000, PAIRS, seed=3)
+    orders.to_csv(d / "orders.csv", index=False)
+    trades.to_csv(d / "trades.csv", index=False)
+    return d
+
+@pytest.mark.parametrize("name, fields, prefixes", [
+    ("orders.csv", EBS_ORDER_FIELDS, ("EBS_BOOK::",)),
+    ("trades.csv", EBS_TRADE_FIELDS, ("EBS_TRADE::", "EBS_BOOK::")),
+])
+def test_read_ebs_block_matches_pandas_row_counts(ebs_csv, name, fields, prefixes):
+    got = read_ebs_block(str(ebs_csv / name), PAIRS, fields, prefixes)
+    ref = pandas_ebs_block(ebs_csv / name, PAIRS, fields, prefixes)
+    assert len(got) == len(ref)
+    assert got["pair"].value_counts().to_dict() == ref["pair"].value_counts().to_dict()
+    assert not got[[f for f in fields if f in got]].isna().all(axis=1).any()
+
+def test_read_ebs_block_types_codes_as_numbers(ebs_csv):
+    got = read_ebs_block(str(ebs_csv / "orders.csv"), PAIRS, EBS_ORDER_FIELDS, ("EBS_BOOK::",))
+    for f in ("TICK_STATUS", "RECORD_TYPE"):
+        assert got[f].dtype == np.float64
+    assert set(got["RECORD_TYPE"].dropna().unique()) <= {1.0, 2.0}
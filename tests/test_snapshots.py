@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from microstructure.book import build_l2_snapshots
+
+def _by_bucket(l2, side, n):
+    rows = l2[l2["side"] == side].reset_index()
+    rows = rows.sort_values(["ts", "price"], ascending=[True, side == "A"])
+    return {ts: g[["price", "depth"]].to_numpy()[:n] for ts, g in rows.groupby("ts", sort=True)}
+
+def test_levels_are_the_best_n_of_to_frame(hand_mbo):
+    snaps = build_l2_snapshots(hand_mbo, ["second"])["second"]
+    l2 = snaps.to_frame()
+    for side in ("A", "B"):
+        px, dq = snaps.levels(side, 3)
+        assert px.shape == dq.shape == (len(snaps), 3)
+        want = _by_bucket(l2, side, 3)
+        for i, ts in enumerate(snaps.ts):
+            w = want[ts]
+            assert np.allclose(px[i, :len(w)], w[:, 0]) and (dq[i, :len(w)] == w[:, 1]).all()
+            # missing levels pad with NaN prices and zero depth
+            assert np.isnan(px[i, len(w):]).all() and (dq[i, len(w):] == 0).all()
+
+def test_to_frame_is_asks_then_bids_with_top_of_book(hand_mbo):
+    snaps = build_l2_snapshots(hand_mbo, ["minute"])["minute"]
+    l2 = snaps.to_frame()
+    tob = snaps.top_of_book()
+    for ts, g in l2.groupby(level="ts"):
+        assert list(g["side"]) == sorted(g["side"])
+        assert (g["best_bid"] == tob.loc[ts, "best_bid"]).all() and (g["best_ask"] == tob.loc[ts, "best_ask"]).all()
+        assert np.allclose(g["spread"], tob.loc[ts, "spread"])
+
+def test_max_levels_and_take(hand_mbo):
+    full = build_l2_snapshots(hand_mbo, ["second"])["second"]
+    capped = build_l2_snapshots(hand_mbo, ["second"], max_levels=1)["second"]
+    assert (capped.ask_count <= 1).all() and (capped.bid_count <= 1).all()
+    assert np.array_equal(capped.levels("A", 1)[1], full.levels("A", 1)[1])
+    rows = np.array([len(full) - 1, 0])
+    sub = full.take(rows)
+    assert list(sub.ts) == [full.ts[r] for r in rows]
+    pd.testing.assert_frame_equal(
+        sub.to_frame().reset_index(drop=True),
+        # to_frame sorts by time, so the reversed take comes back in time order
+        pd.concat([full.to_frame().loc[[full.ts[r]]] for r in sorted(rows)]).reset_index(drop=True),
+    )